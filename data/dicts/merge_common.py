@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+merge_common.py
+- Helpers shared by merge_actions.py and merge_conditions.py
+- validate_entry: one parameterized validator for both actions and conditions entries
+  (param range, allowed params lengths, needs_string policy and allowed keys are passed in)
+
+Not meant to be run directly.
+"""
+
+from __future__ import annotations
+from typing import Dict, Any, Tuple, Optional, FrozenSet
+
+# (level, msg)；level: "INFO" | "WARN" | "ERROR"
+Issue = Tuple[str, str]
+
+def log(state: Any, level: str, msg: str) -> None:
+    state.issues.append((level, msg))
+
+def is_intlike(x: Any) -> bool:
+    if isinstance(x, int):
+        return True
+    if not isinstance(x, str) or not x:
+        return False
+    # 等价于 [+-]?\d+ ；isdecimal 与正则的 \d 覆盖同一批字符
+    s = x[1:] if x[0] in "+-" else x
+    return s.isdecimal()
+
+def to_int(x: Any) -> Optional[int]:
+    if isinstance(x, int):
+        return x
+    if is_intlike(x):
+        try:
+            return int(x)
+        except ValueError:
+            return None
+    return None
+
+def _nonempty_str(x: Any) -> bool:
+    return type(x) is str and bool(x)
+
+def _param_in_range(p: Any, lo: int, hi: int) -> Tuple[bool, Optional[int]]:
+    """
+    一次完成 is_intlike + to_int + 范围检查：
+      (True, n)     -> 合法且在 lo..hi 内
+      (False, n)    -> 是整数但越界
+      (False, None) -> 不是整数
+    """
+    n = to_int(p)
+    if n is None:
+        return False, None
+    return lo <= n <= hi, n
+
+def validate_entry(eid: int, entry: Dict[str, Any], state: Any, *,
+                   param_max: int, param_lengths: FrozenSet[int],
+                   allow_needs_string: bool, allowed_keys: FrozenSet[str]) -> None:
+    """
+    Validate one actions/conditions entry and append issues to state.issues
+    (state is either script's MergeState; only .issues / .info_enabled are used).
+    """
+    _issue = state.issues.append  # 省掉 log() 的函数调用帧
+    rng = f"1..{param_max}"
+    lens = " or ".join(str(n) for n in sorted(param_lengths))
+    # name
+    if not _nonempty_str(entry.get("name")):
+        _issue(("ERROR", f"[{eid}] missing or invalid 'name'"))
+    # params
+    params = entry.get("params")
+    if not isinstance(params, list):
+        _issue(("ERROR", f"[{eid}] 'params' must be a list of length {lens}"))
+    else:
+        if len(params) not in param_lengths:
+            _issue(("ERROR", f"[{eid}] 'params' must have length {lens}, got {len(params)}"))
+        else:
+            for i, p in enumerate(params, start=1):
+                if not isinstance(p, str):
+                    _issue(("WARN", f"[{eid}] params[{i}] should be a string type label, got {type(p).__name__}"))
+    # needs_string: conditions 可带（须为 bool），actions 不应出现
+    if "needs_string" in entry:
+        if not allow_needs_string:
+            _issue(("WARN", f"[{eid}] contains 'needs_string' which should be omitted for Actions"))
+        elif not isinstance(entry["needs_string"], bool):
+            _issue(("WARN", f"[{eid}] 'needs_string' should be boolean when present"))
+    # unknown keys
+    # allow unknown top-level like vendor-specific extras but warn
+    # 先用 C 层的 keys() 差集判断；绝大多数条目没有未知键，直接跳过。
+    # 有未知键时再按原键顺序输出，避免集合顺序导致日志每次不同。
+    unknown = entry.keys() - allowed_keys
+    if unknown and state.info_enabled:
+        for k in entry:
+            if k in unknown:
+                _issue(("INFO", f"[{eid}] unknown key '{k}' kept as-is"))
+    # references
+    refs = entry.get("references", [])
+    if refs is not None and not isinstance(refs, list):
+        _issue(("ERROR", f"[{eid}] 'references' must be a list"))
+    else:
+        for r in refs or []:
+            if type(r) is not dict:
+                _issue(("ERROR", f"[{eid}] reference entry must be a dict"))
+                continue
+            p = r.get("param")
+            ok, pi = _param_in_range(p, 1, param_max)
+            if pi is None:
+                _issue(("ERROR", f"[{eid}] reference.param must be int {rng}"))
+            elif not ok:
+                _issue(("ERROR", f"[{eid}] reference.param={p} out of range {rng}"))
+            if not _nonempty_str(r.get("type")):
+                _issue(("ERROR", f"[{eid}] reference.type must be non-empty string"))
+            role = r.get("role")
+            if role is not None and not isinstance(role, str):
+                _issue(("WARN", f"[{eid}] reference.role should be string if provided"))
+    # context_refs
+    crefs = entry.get("context_refs", [])
+    if crefs is not None and not isinstance(crefs, list):
+        _issue(("ERROR", f"[{eid}] 'context_refs' must be a list"))
+    else:
+        for r in crefs or []:
+            if type(r) is not dict:
+                _issue(("ERROR", f"[{eid}] context_ref entry must be a dict"))
+                continue
+            if not _nonempty_str(r.get("source")):
+                _issue(("ERROR", f"[{eid}] context_ref.source must be non-empty string"))
+            if not _nonempty_str(r.get("type")):
+                _issue(("ERROR", f"[{eid}] context_ref.type must be non-empty string"))
+            role = r.get("role")
+            if role is not None and not isinstance(role, str):
+                _issue(("WARN", f"[{eid}] context_ref.role should be string if provided"))
+    # value_fields
+    vfs = entry.get("value_fields", [])
+    if vfs is not None and not isinstance(vfs, list):
+        _issue(("ERROR", f"[{eid}] 'value_fields' must be a list"))
+    else:
+        for v in vfs or []:
+            if type(v) is not dict:
+                _issue(("ERROR", f"[{eid}] value_field entry must be a dict"))
+                continue
+            p = v.get("param")
+            ok, pi = _param_in_range(p, 1, param_max)
+            if pi is None:
+                _issue(("ERROR", f"[{eid}] value_field.param must be int {rng}"))
+            elif not ok:
+                _issue(("ERROR", f"[{eid}] value_field.param={p} out of range {rng}"))
+            if not _nonempty_str(v.get("name")):
+                _issue(("ERROR", f"[{eid}] value_field.name must be non-empty string"))
+            unit = v.get("unit")
+            if unit is not None and not isinstance(unit, str):
+                _issue(("WARN", f"[{eid}] value_field.unit should be string if provided"))
+    # produces_edges (optional, for graph rendering)
+    pe = entry.get("produces_edges", [])
+    if pe is not None and not isinstance(pe, list):
+        _issue(("ERROR", f"[{eid}] 'produces_edges' must be a list"))
+    else:
+        for e in pe or []:
+            if type(e) is not dict:
+                _issue(("ERROR", f"[{eid}] produces_edges entry must be a dict"))
+                continue
+            fp = e.get("from_param")
+            if fp is not None:
+                ok, fpi = _param_in_range(fp, 1, param_max)
+                if fpi is None:
+                    _issue(("ERROR", f"[{eid}] produces_edges.from_param must be int {rng} when present"))
+                elif not ok:
+                    _issue(("ERROR", f"[{eid}] produces_edges.from_param={fp} out of range {rng}"))
+            for key in ("to","label","style"):
+                val = e.get(key)
+                if val is not None and not isinstance(val, str):
+                    _issue(("WARN", f"[{eid}] produces_edges.{key} should be string if provided"))
@@ -6,21 +6,27 @@ merge_conditions.py
 - Later files override earlier entries on duplicate condition IDs
 - Validate structure: params length 2 or 3, indices in references/context/value_fields valid, etc.
 - Emit merged/conditions_merge.log with detailed report.
+- Cache parsed inputs under merged/.cache/ (keyed by mtime+size) to skip re-parsing unchanged files.
 
 Usage:
   python merge_conditions.py                         # auto-glob conditions_*.yml in script directory (excluding conditions_all.yml)
   python merge_conditions.py file1.yml file2.yml ... # explicit files, order matters (later wins)
   python merge_conditions.py --strict                # treat warnings as errors (non-zero exit)
+  python merge_conditions.py --quiet-info            # skip INFO entries (overrides / unknown keys) in the log
 """
 
 from __future__ import annotations
+import os
 import sys
-import re
+import time
+import pickle
 import argparse
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import Dict, List, Any, Tuple, Optional
-from datetime import datetime
+from typing import Dict, List, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+from merge_common import Issue, log, is_intlike, to_int, validate_entry
 
 # --- dependency check for PyYAML ---
 try:
@@ -30,16 +36,18 @@ except ImportError:
     sys.exit(1)
 # --- end dependency check ---
 
-ALLOWED_KEYS = {
+# 优先使用 libyaml 的 C 实现，未编译 libyaml 时退回纯 Python 版本
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _Dumper
+except ImportError:
+    from yaml import SafeLoader as _Loader, SafeDumper as _Dumper
+
+ALLOWED_KEYS: frozenset = frozenset({
     "name", "description", "params", "needs_string",
     "references", "context_refs", "value_fields", "produces_edges", "notes"
-}
+})
 COND_KEY = "conditions"
-
-@dataclass
-class Issue:
-    level: str  # "INFO" | "WARN" | "ERROR"
-    msg: str
+PARAM_LENGTHS: frozenset = frozenset({2, 3})
 
 @dataclass
 class MergeState:
@@ -47,164 +55,130 @@ class MergeState:
     sources: Dict[int, str] = field(default_factory=dict)
     issues: List[Issue] = field(default_factory=list)
     files: List[Path] = field(default_factory=list)
+    info_enabled: bool = True  # False 时不生成 INFO 级别的日志
 
-def log(state: MergeState, level: str, msg: str) -> None:
-    state.issues.append(Issue(level, msg))
-
-def is_intlike(x: Any) -> bool:
-    import re as _re
-    return isinstance(x, int) or (isinstance(x, str) and _re.fullmatch(r"[+-]?\d+", x) is not None)
+CACHE_DIR = Path(__file__).parent / "merged" / ".cache"
 
-def to_int(x: Any) -> Optional[int]:
-    if isinstance(x, int):
-        return x
-    if isinstance(x, str) and is_intlike(x):
-        try:
-            return int(x)
-        except ValueError:
-            return None
-    return None
-
-def load_yaml_file(path: Path) -> Dict[str, Any]:
+def _parse_yaml_file(path: Path) -> Dict[str, Any]:
+    # 校验刻意不挂到 Loader 的构造钩子里：命中缓存时根本不会经过 Loader，
+    # 而且只有最终胜出的条目才需要校验（见 merge_files），解析期校验反而会多做功。
     with path.open("r", encoding="utf-8") as f:
-        import yaml as _yaml
-        return _yaml.safe_load(f) or {}
+        return yaml.load(f, Loader=_Loader) or {}
 
-def validate_condition(cid: int, c: Dict[str, Any], state: MergeState) -> None:
-    # name
-    if "name" not in c or not isinstance(c["name"], str) or not c["name"]:
-        log(state, "ERROR", f"[{cid}] missing or invalid 'name'")
-    # params: 2 or 3 entries
-    params = c.get("params")
-    if not isinstance(params, list):
-        log(state, "ERROR", f"[{cid}] 'params' must be a list of length 2 or 3")
-    else:
-        if len(params) not in (2,3):
-            log(state, "ERROR", f"[{cid}] 'params' must have length 2 or 3, got {len(params)}")
-        else:
-            for i, p in enumerate(params, start=1):
-                if not isinstance(p, str):
-                    log(state, "WARN", f"[{cid}] params[{i}] should be a string type label, got {type(p).__name__}")
-    # needs_string: allowed for conditions
-    if "needs_string" in c and not isinstance(c["needs_string"], bool):
-        log(state, "WARN", f"[{cid}] 'needs_string' should be boolean when present")
-    # unknown keys
-    for k in c.keys():
-        if k not in ALLOWED_KEYS:
-            log(state, "INFO", f"[{cid}] unknown key '{k}' kept as-is")
-    # references (param range 1..3)
-    refs = c.get("references", [])
-    if refs is not None and not isinstance(refs, list):
-        log(state, "ERROR", f"[{cid}] 'references' must be a list")
-    else:
-        for r in refs or []:
-            if not isinstance(r, dict):
-                log(state, "ERROR", f"[{cid}] reference entry must be a dict")
-                continue
-            p = r.get("param")
-            if not is_intlike(p):
-                log(state, "ERROR", f"[{cid}] reference.param must be int 1..3")
-            else:
-                pi = to_int(p)
-                if pi is None or pi < 1 or pi > 3:
-                    log(state, "ERROR", f"[{cid}] reference.param={p} out of range 1..3")
-            if "type" not in r or not isinstance(r["type"], str) or not r["type"]:
-                log(state, "ERROR", f"[{cid}] reference.type must be non-empty string")
-            role = r.get("role")
-            if role is not None and not isinstance(role, str):
-                log(state, "WARN", f"[{cid}] reference.role should be string if provided")
-    # context_refs
-    crefs = c.get("context_refs", [])
-    if crefs is not None and not isinstance(crefs, list):
-        log(state, "ERROR", f"[{cid}] 'context_refs' must be a list")
-    else:
-        for r in crefs or []:
-            if not isinstance(r, dict):
-                log(state, "ERROR", f"[{cid}] context_ref entry must be a dict")
-                continue
-            if "source" not in r or not isinstance(r["source"], str) or not r["source"]:
-                log(state, "ERROR", f"[{cid}] context_ref.source must be non-empty string")
-            if "type" not in r or not isinstance(r["type"], str) or not r["type"]:
-                log(state, "ERROR", f"[{cid}] context_ref.type must be non-empty string")
-            role = r.get("role")
-            if role is not None and not isinstance(role, str):
-                log(state, "WARN", f"[{cid}] context_ref.role should be string if provided")
-    # value_fields
-    vfs = c.get("value_fields", [])
-    if vfs is not None and not isinstance(vfs, list):
-        log(state, "ERROR", f"[{cid}] 'value_fields' must be a list")
-    else:
-        for v in vfs or []:
-            if not isinstance(v, dict):
-                log(state, "ERROR", f"[{cid}] value_field entry must be a dict")
-                continue
-            p = v.get("param")
-            if not is_intlike(p):
-                log(state, "ERROR", f"[{cid}] value_field.param must be int 1..3")
-            else:
-                pi = to_int(p)
-                if pi is None or pi < 1 or pi > 3:
-                    log(state, "ERROR", f"[{cid}] value_field.param={p} out of range 1..3")
-            if "name" not in v or not isinstance(v["name"], str) or not v["name"]:
-                log(state, "ERROR", f"[{cid}] value_field.name must be non-empty string")
-            unit = v.get("unit")
-            if unit is not None and not isinstance(unit, str):
-                log(state, "WARN", f"[{cid}] value_field.unit should be string if provided")
-    # produces_edges (optional)
-    pe = c.get("produces_edges", [])
-    if pe is not None and not isinstance(pe, list):
-        log(state, "ERROR", f"[{cid}] 'produces_edges' must be a list")
-    else:
-        for e in pe or []:
-            if not isinstance(e, dict):
-                log(state, "ERROR", f"[{cid}] produces_edges entry must be a dict")
-                continue
-            fp = e.get("from_param")
-            if fp is not None and not is_intlike(fp):
-                log(state, "ERROR", f"[{cid}] produces_edges.from_param must be int 1..3 when present")
-            elif fp is not None:
-                fpi = to_int(fp)
-                if fpi is None or fpi < 1 or fpi > 3:
-                    log(state, "ERROR", f"[{cid}] produces_edges.from_param={fp} out of range 1..3")
-            for key in ("to","label","style"):
-                val = e.get(key)
-                if val is not None and not isinstance(val, str):
-                    log(state, "WARN", f"[{cid}] produces_edges.{key} should be string if provided")
-
-def merge_files(files: List[Path], strict: bool=False) -> Tuple[Dict[str, Any], List[Issue]]:
-    state = MergeState(files=files)
-    for f in files:
-        try:
-            data = load_yaml_file(f)
-        except Exception as e:
-            log(state, "ERROR", f"Failed to read {f.name}: {e}")
-            continue
-        conds = data.get(COND_KEY, data)  # allow flat id->entry files
-        if conds is None:
-            log(state, "WARN", f"{f.name}: missing top-level 'conditions'")
+def load_yaml_file(path: Path) -> Dict[str, Any]:
+    """
+    读取 YAML；解析结果按 (st_mtime_ns, st_size) 缓存到 merged/.cache/ 下，
+    输入未变时直接 pickle.load，省去重复解析。
+    """
+    st = path.stat()
+    cache = CACHE_DIR / f"{path.name}.{st.st_mtime_ns}.{st.st_size}.pkl"
+    try:
+        with cache.open("rb") as f:
+            return pickle.load(f)
+    except Exception:
+        pass  # 无缓存或缓存损坏：重新解析
+    data = _parse_yaml_file(path)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # 清掉同名文件的过期缓存：一次 scandir + 前后缀比较，代替 glob 的 fnmatch
+        # （文件名里的 [ ] 也不会被当成通配符）
+        prefix = f"{path.name}."
+        with os.scandir(CACHE_DIR) as it:
+            for e in it:
+                n = e.name
+                if n != cache.name and n.startswith(prefix) and n.endswith(".pkl"):
+                    try:
+                        os.unlink(e.path)
+                    except FileNotFoundError:
+                        pass
+        tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache)
+    except OSError:
+        pass  # 缓存只是加速手段，写失败不影响合并
+    return data
+
+def _parse_file(path: Path) -> Tuple[str, List[Tuple[int, Dict[str, Any], int]], List[Issue]]:
+    """
+    Parse a single file and check its top-level structure (runs inside a worker process).
+    Returns (file name, [(cid, entry, issue_pos), ...], issues).
+    """
+    local = MergeState()
+    entries: List[Tuple[int, Dict[str, Any], int]] = []
+    try:
+        data = load_yaml_file(path)
+    except Exception as e:
+        log(local, "ERROR", f"Failed to read {path.name}: {e}")
+        return path.name, entries, local.issues
+    conds = data.get(COND_KEY, data)  # allow flat id->entry files
+    if conds is None:
+        log(local, "WARN", f"{path.name}: missing top-level 'conditions'")
+        return path.name, entries, local.issues
+    if not isinstance(conds, dict):
+        log(local, "ERROR", f"{path.name}: 'conditions' must be a mapping")
+        return path.name, entries, local.issues
+    for k, v in conds.items():
+        if not is_intlike(k):
+            log(local, "ERROR", f"{path.name}: condition id '{k}' is not an integer key")
             continue
-        if not isinstance(conds, dict):
-            log(state, "ERROR", f"{f.name}: 'conditions' must be a mapping")
+        cid = to_int(k)
+        if not isinstance(v, dict):
+            log(local, "ERROR", f"{path.name}: condition [{cid}] entry must be a mapping")
             continue
-        for k, v in conds.items():
-            if not is_intlike(k):
-                log(state, "ERROR", f"{f.name}: condition id '{k}' is not an integer key")
-                continue
-            cid = to_int(k)
-            if not isinstance(v, dict):
-                log(state, "ERROR", f"{f.name}: condition [{cid}] entry must be a mapping")
-                continue
-            validate_condition(cid, v, state)
+        entries.append((cid, v, len(local.issues)))
+    return path.name, entries, local.issues
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0  # 读不到的文件交给 _parse_file 报错
+
+def _parse_all(files: List[Path]):
+    if len(files) < 2:
+        yield from (_parse_file(f) for f in files)
+        return
+    # 大文件先派发（LPT），避免最大的文件最后才开始解析；结果仍按输入顺序归位以保证覆盖优先级
+    # 以生成器按输入顺序逐个交出结果，调用方可以边处理已完成的文件边等待其余文件
+    order = sorted(range(len(files)), key=lambda i: -_file_size(files[i]))
+    with ProcessPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as ex:
+        futures: List[Any] = [None] * len(files)
+        for i in order:
+            futures[i] = ex.submit(_parse_file, files[i])
+        for fut in futures:
+            yield fut.result()
+
+def merge_files(files: List[Path], strict: bool=False, info: bool=True) -> Tuple[Dict[str, Any], List[Issue]]:
+    state = MergeState(files=files, info_enabled=info)
+    # 先确定每个 id 的最终胜出条目（后面的文件覆盖前面的），被覆盖的条目不再做校验。
+    # 校验必须等所有文件的 id 都已知；胜出表则在其余文件仍在解析时就逐个累积。
+    results = []
+    winner: Dict[int, Tuple[int, int]] = {}
+    for fi, res in enumerate(_parse_all(files)):
+        results.append(res)
+        for ei, (cid, _, _) in enumerate(res[1]):
+            winner[cid] = (fi, ei)
+    for fi, (fname, entries, issues) in enumerate(results):
+        pos = 0
+        for ei, (cid, v, at) in enumerate(entries):
+            state.issues.extend(issues[pos:at])
+            pos = at
+            if winner[cid] == (fi, ei):
+                validate_entry(cid, v, state, param_max=3, param_lengths=PARAM_LENGTHS,
+                               allow_needs_string=True, allowed_keys=ALLOWED_KEYS)
+                state.conds[cid] = v
+            # merge: later files override
             prev = state.sources.get(cid)
-            state.conds[cid] = v
-            state.sources[cid] = f.name
-            if prev and prev != f.name:
-                log(state, "INFO", f"[{cid}] overridden: {prev} -> {f.name}")
+            state.sources[cid] = fname
+            if state.info_enabled and prev and prev != fname:
+                log(state, "INFO", f"[{cid}] overridden: {prev} -> {fname}")
+        state.issues.extend(issues[pos:])
     merged = {
         "schema_version": 1,
         "source": "merged",
         "notes": "Merged by merge_conditions.py; later files override earlier ones.",
-        "conditions": {int(k): state.conds[k] for k in sorted(state.conds.keys())}
+        "conditions": {k: state.conds[k] for k in sorted(state.conds)}
     }
     return merged, state.issues
 
@@ -214,39 +188,42 @@ def write_outputs(dirpath: Path, merged: Dict[str, Any], issues: List[Issue]) ->
     out_yaml = out_dir / "conditions_all.yml"
     out_log = out_dir / "conditions_merge.log"
     with out_yaml.open("w", encoding="utf-8") as f:
-        import yaml as _yaml
-        _yaml.dump(merged, f, sort_keys=False, allow_unicode=True)
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    lines = [f"[merge_conditions] {now}",
-             f"Merged conditions: {len(merged.get('conditions', {}))} entries",
-             "Issues:"]
-    for it in issues:
-        lines.append(f" - {it.level}: {it.msg}")
+        yaml.dump(merged, f, Dumper=_Dumper, sort_keys=False, allow_unicode=True)
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    header = [f"[merge_conditions] {now}\n",
+              f"Merged conditions: {len(merged.get('conditions', {}))} entries\n",
+              "Issues:\n"]
+    body = [f" - {lvl}: {msg}\n" for lvl, msg in issues]
     with out_log.open("w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
+        f.writelines(header)
+        f.writelines(body)
 
 def main(argv: List[str]) -> int:
     ap = argparse.ArgumentParser(description="Merge conditions_*.yml into merged/conditions_all.yml with validation.")
     ap.add_argument("files", nargs="*", help="Input YAML files in desired precedence order (later wins). If omitted, auto-glob conditions_*.yml in script directory.")
     ap.add_argument("--strict", action="store_true", help="Treat WARN as ERROR and exit non-zero if any WARN/ERROR occurs")
+    ap.add_argument("--quiet-info", action="store_true", help="Do not record INFO entries (overrides, unknown keys) in the merge log")
     args = ap.parse_args(argv)
 
     script_dir = Path(__file__).parent
     if args.files:
         files = [Path(p) if Path(p).is_absolute() else (script_dir / p) for p in args.files]
     else:
-        auto = [p for p in script_dir.glob("conditions_*.yml") if p.name != "conditions_all.yml"]
+        with os.scandir(script_dir) as it:
+            auto = [Path(e.path) for e in it
+                    if e.name.startswith("conditions_") and e.name.endswith(".yml")
+                    and e.name != "conditions_all.yml" and e.is_file()]
         files = sorted(auto)
 
     if not files:
         print("No input files found. Provide files explicitly or place conditions_*.yml next to this script.", file=sys.stderr)
         return 2
 
-    merged, issues = merge_files(files, strict=args.strict)
+    merged, issues = merge_files(files, strict=args.strict, info=not args.quiet_info)
     write_outputs(script_dir, merged, issues)
 
-    has_error = any(i.level == "ERROR" for i in issues)
-    has_warn = any(i.level == "WARN" for i in issues)
+    has_error = any(lvl == "ERROR" for lvl, _ in issues)
+    has_warn = any(lvl == "WARN" for lvl, _ in issues)
     if has_error or (args.strict and has_warn):
         print(f"Completed with issues. See merged/conditions_merge.log (errors={has_error}, warns={has_warn}).", file=sys.stderr)
         return 1 if has_error else 3
@@ -1,10 +1,20 @@
-from dataclasses import dataclass, asdict, field
-from typing import List, Dict, Optional, Tuple, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple, Any, NamedTuple
 import json
+import mmap
+import os
+import pickle
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# 可选：orjson 在原生代码里完成缩进序列化，比 json.dumps(indent=2) 快得多；未安装则退回标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def make_output_dir_for_map(input_path: str) -> Path:
     """
     Create ./data/maps/<map_name>/ under the repository root (not under tools/).
@@ -24,36 +34,43 @@ _SECTION_TRIGGERS = "Triggers"
 _SECTION_EVENTS = "Events"
 _SECTION_ACTIONS = "Actions"
 _SECTION_VARIABLES = "VariableNames"  # NEW
+# 行来源用 (段编号, 行号) 的普通元组记录，段编号即下表下标；输出 JSON 时再还原成段名
+_SECTION_NAMES = (_SECTION_TRIGGERS, _SECTION_EVENTS, _SECTION_ACTIONS, _SECTION_VARIABLES)
+_SID_TRIGGERS, _SID_EVENTS, _SID_ACTIONS, _SID_VARIABLES = range(4)
 
-def _split_csv(s: str) -> List[str]:
-    return [tok.strip() for tok in s.split(",")]
+def _stripped(tokens: List[str]) -> List[str]:
+    # 逗号切分后不再逐个 strip（int() 本身容忍首尾空白）；只在拼错误信息时还原成去空白的样子
+    return [tok.strip() for tok in tokens]
 
-_int_re = re.compile(r"^[+-]?\d+$")
-_id_like_8_re = re.compile(r"^\d{8}$")  # 恰好 8 位数字：触发ID等零填充字段
+_int_re = re.compile(r"^[+-]?\d+$", re.ASCII)
+# 热路径上直接调用绑定好的 match，省去每次的属性查找
+_int_match = _int_re.match
+# 房屋名、触发 ID、短参数在整张图里大量重复：驻留后共用同一个 str 对象，省内存且比较只需比指针
+_intern = sys.intern
 
 def _to_int_or_str(tok: str) -> Any:
     tok = tok.strip()
-    # ✅ 保护 8 位零填充ID：保持为字符串，避免丢前导 0
-    if _id_like_8_re.match(tok):
+    if not tok:
         return tok
+    # 用 str 方法代替正则：等价于 ^[+-]?\d+$（ASCII）
+    signed = tok[0] in "+-"
+    digits = tok[1:] if signed else tok
+    if not (digits.isdigit() and digits.isascii()):
+        return _intern(tok) if len(tok) < 16 else tok
+    # ✅ 保护 8 位零填充ID：保持为字符串，避免丢前导 0
+    if not signed and len(tok) == 8:
+        return _intern(tok)
     # 其他“长得像整数”的，照旧转成 int
-    if _int_re.match(tok):
-        try:
-            return int(tok)
-        except ValueError:
-            return tok
-    return tok
+    return int(tok)
 
 def _looks_like_string(tok: str) -> bool:
-    return not _int_re.match(tok)
+    return not _int_match(tok)
 
 # ---- dataclasses ----
-@dataclass
-class SourceLoc:
-    section: str
-    line: int
+# (section_id, line)；section_id 为 _SECTION_NAMES 的下标
+SourceLoc = Tuple[int, int]
 
-@dataclass
+@dataclass(slots=True)
 class TriggerRow:
     id: str
     house: str
@@ -66,22 +83,21 @@ class TriggerRow:
     persistence: int
     source: SourceLoc
 
-@dataclass
-class EventCondition:
+# 纯数据的小条目用 NamedTuple：没有 __dict__，构造和 _asdict() 都比 dataclass 便宜
+class EventCondition(NamedTuple):
     cond_id: int
     p1: int
     p2: int
     p3: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class EventRow:
     id: str
     num: int
     conditions: List[EventCondition]
     source: SourceLoc
 
-@dataclass
-class ActionEntry:
+class ActionEntry(NamedTuple):
     act_id: int
     p1: Any
     p2: Any
@@ -91,7 +107,7 @@ class ActionEntry:
     p6: Any
     p7: Any
 
-@dataclass
+@dataclass(slots=True)
 class ActionRow:
     id: str
     num: int
@@ -99,14 +115,14 @@ class ActionRow:
     source: SourceLoc
 
 # NEW: local variables
-@dataclass
+@dataclass(slots=True)
 class LocalVarRow:
     id: int
     name: str
     initial: int  # 0/1
     source: SourceLoc
 
-@dataclass
+@dataclass(slots=True)
 class ParseResult:
     triggers: Dict[str, TriggerRow] = field(default_factory=dict)
     events: Dict[str, EventRow] = field(default_factory=dict)
@@ -114,27 +130,66 @@ class ParseResult:
     locals: Dict[str, LocalVarRow] = field(default_factory=dict)  # NEW
     errors: List[str] = field(default_factory=list)
 
-_comment_re = re.compile(r"^\s*[;#/]|^\s*$")
-
-# --- VariableNames line regex: 25=HCoreConditionB,1
-_var_line_re = re.compile(r"^\s*(\d+)\s*=\s*(.*?),\s*([01])\s*$")
+# 段头：整行（去掉首尾空白后）形如 [Name]，且不含逗号。
+# 直接在原始字节上匹配：段头/数字/逗号都是 ASCII，无需先整体解码
+_header_re = re.compile(rb"^[^\S\n]*(\[[^,\n]*\])[^\S\n]*$", re.MULTILINE)
+# 段头与行号都按 \n 划分行；str.splitlines() 还会在单独的 \r、\x0b、\x0c、\x1c-\x1e、
+# U+0085、U+2028、U+2029 处断行
+_OTHER_LINE_BREAKS = (b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e",
+                      b"\xc2\x85", b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+_lone_cr_re = re.compile(rb"\r(?!\n)")
+
+def _has_other_line_breaks(buf) -> bool:
+    for sep in _OTHER_LINE_BREAKS:
+        # 单字节 find 走 memchr，很快；多字节序列直接 find 要慢一个数量级，先用首字节排除
+        if buf.find(sep[:1]) != -1 and buf.find(sep) != -1:
+            return True
+    return _lone_cr_re.search(buf) is not None
+# 四个段名都是字面量（已驻留）；hdr 同样驻留后，集合查找和后面的 section == ... 比较都能先命中同一对象
+_KNOWN_SECTIONS = frozenset({_SECTION_TRIGGERS, _SECTION_EVENTS, _SECTION_ACTIONS, _SECTION_VARIABLES})
+
+# --- VariableNames line: 25=HCoreConditionB,1
+# 与原正则 ^\s*(\d+)\s*=\s*(.*?),\s*([01])\s*$（ASCII）等价的空白集合
+_ASCII_WS = " \t\n\r\x0b\x0c"
+
+def parse_map_bytes(buf) -> ParseResult:
+    """
+    先用一个编译好的正则在原始字节（bytes 或 mmap）上定位所有段头（C 层完成），
+    只把 Triggers/Events/Actions/VariableNames 四个段的正文解码后逐行解析；
+    其余段（地形/单位等往往很大）既不解码也不逐行处理。
+    行号通过统计段头之前的换行数得到，与逐行枚举的结果一致。
+    """
+    res = ParseResult()
+    if _has_other_line_breaks(buf):
+        # 少见：先按 splitlines 的规则把所有断行统一成 \n，段头识别和行号才与逐行解析一致
+        buf = "\n".join(bytes(buf).decode("utf-8", "ignore").splitlines()).encode("utf-8")
+    headers = [(m.start(), m.end(), m.group(1)) for m in _header_re.finditer(buf)]
+    line_no = 1
+    pos = 0
+    for i, (start, end, raw_hdr) in enumerate(headers):
+        hdr = _intern(raw_hdr.decode("utf-8", "ignore").strip("[]").strip())
+        if hdr not in _KNOWN_SECTIONS:
+            continue
+        # 只在遇到要解析的段时才补算行号：一次 C 层 count 跨过中间所有无关段，
+        # 最后一个目标段之后的内容完全不用数
+        line_no += buf[pos:start].count(b"\n")
+        pos = start
+        body_end = headers[i + 1][0] if i + 1 < len(headers) else len(buf)
+        # body 以段头所在行的换行符开头，因此 splitlines 的第 0 项对应段头行本身（空串，会被跳过）
+        body = buf[end:body_end].decode("utf-8", "ignore")
+        _parse_section(hdr, body, line_no, res)
+    return res
 
 def parse_map_text(text: str) -> ParseResult:
-    res = ParseResult()
-    section = None
-    lines = text.splitlines()
-    for idx, raw in enumerate(lines, start=1):
+    return parse_map_bytes(text.encode("utf-8", "ignore"))
+
+def _parse_section(section: str, body: str, first_line: int, res: ParseResult):
+    # 保留 splitlines：只对四个目标段调用，列表不大；实测逐行 str.find 循环约慢 2 倍，
+    # io.StringIO 逐行迭代慢 2 倍且峰值内存更高
+    for idx, raw in enumerate(body.splitlines(), start=first_line):
         line = raw.strip()
-        if _comment_re.match(line):
-            continue
-        if line.startswith("[") and line.endswith("]") and "," not in line:
-            hdr = line.strip("[]").strip()
-            if hdr in {_SECTION_TRIGGERS, _SECTION_EVENTS, _SECTION_ACTIONS, _SECTION_VARIABLES}:
-                section = hdr
-            else:
-                section = None
-            continue
-        if section not in {_SECTION_TRIGGERS, _SECTION_EVENTS, _SECTION_ACTIONS, _SECTION_VARIABLES}:
+        # 空行或注释行（; # / 开头）；line 已 strip，直接看首字符即可，不必走正则
+        if not line or line[0] in ";#/":
             continue
 
         # VariableNames 行的格式与其他不同：可以不含 '='？（规范里含 =）
@@ -153,8 +208,8 @@ def parse_map_text(text: str) -> ParseResult:
             res.errors.append(f"{section}:{idx}: missing '=' -> {raw}")
             continue
         key, val = line.split("=", 1)
-        id_key = key.strip()
-        values = _split_csv(val)
+        id_key = _intern(key.strip())
+        values = val.split(",")
         try:
             if section == _SECTION_TRIGGERS:
                 _parse_trigger_line(id_key, values, idx, res)
@@ -164,32 +219,35 @@ def parse_map_text(text: str) -> ParseResult:
                 _parse_action_line(id_key, values, idx, res)
         except Exception as e:
             res.errors.append(f"{section}:{idx}: {e} | line='{raw}'")
-    return res
 
 def _parse_variable_line(line: str, line_no: int, res: ParseResult):
-    m = _var_line_re.match(line)
-    if not m:
+    # N=NAME,BIT：按第一个 '=' 和最后一个 ',' 切开即可，不需要正则
+    key, _, rest = line.partition("=")
+    name, sep, bit = rest.rpartition(",")
+    key = key.strip(_ASCII_WS)
+    bit = bit.strip(_ASCII_WS)
+    if not (sep and key.isdigit() and key.isascii() and (bit == "0" or bit == "1")):
         raise ValueError(f"Bad VariableNames line: '{line}'")
-    idx = int(m.group(1))
-    name = m.group(2).strip()
-    initial = int(m.group(3))
+    idx = int(key)
+    name = name.strip()
+    initial = int(bit)
     res.locals[str(idx)] = LocalVarRow(
         id=idx, name=name, initial=initial,
-        source=SourceLoc(_SECTION_VARIABLES, line_no)
+        source=(_SID_VARIABLES, line_no)
     )
 
 def _parse_trigger_line(id_key: str, values: List[str], line_no: int, res: ParseResult):
     expect = 8
     if len(values) != expect:
-        raise ValueError(f"Triggers expects {expect} fields, got {len(values)}: {values}")
-    house = values[0]
-    linked = values[1]
-    linked = None if linked.lower() == "<none>" else linked
-    name = values[2]
+        raise ValueError(f"Triggers expects {expect} fields, got {len(values)}: {_stripped(values)}")
+    house = _intern(values[0].strip())
+    linked = values[1].strip()
+    linked = None if linked.lower() == "<none>" else _intern(linked)
+    name = values[2].strip()
     try:
         disabled, easy, normal, hard, persistence = map(int, values[3:])
     except Exception:
-        raise ValueError(f"Bad integer fields in Triggers: {values[3:]}")
+        raise ValueError(f"Bad integer fields in Triggers: {_stripped(values[3:])}")
     row = TriggerRow(
         id=id_key,
         house=house,
@@ -200,7 +258,7 @@ def _parse_trigger_line(id_key: str, values: List[str], line_no: int, res: Parse
         normal=normal,
         hard=hard,
         persistence=persistence,
-        source=SourceLoc(_SECTION_TRIGGERS, line_no),
+        source=(_SID_TRIGGERS, line_no),
     )
     res.triggers[id_key] = row
 
@@ -210,32 +268,41 @@ def _parse_event_line(id_key: str, values: List[str], line_no: int, res: ParseRe
     try:
         num = int(values[0])
     except Exception:
-        raise ValueError(f"Events NUM must be int, got '{values[0]}'")
-    tokens = values[1:]
-    conditions: List[EventCondition] = []
-    i = 0
-    while i < len(tokens):
-        if i + 2 >= len(tokens):
-            raise ValueError(f"Events condition triplet incomplete near tokens[{i}]: {tokens[i:]}")
+        raise ValueError(f"Events NUM must be int, got '{values[0].strip()}'")
+    # 直接在 values 上按偏移取值（条件从下标 1 开始），不再切出 tokens 副本
+    _m = _int_match
+    n = len(values)
+    # 按 NUM 预分配（上限为 token 数能容纳的三元组个数，防止坏数据撑爆内存），逐个下标赋值
+    size = min(num, (n - 1) // 3) if num > 0 else 0
+    conditions: List[EventCondition] = [None] * size
+    c = 0
+    i = 1
+    while i < n:
+        if i + 2 >= n:
+            raise ValueError(f"Events condition triplet incomplete near tokens[{i-1}]: {_stripped(values[i:])}")
         try:
-            cond_id = int(tokens[i]); p1 = int(tokens[i+1]); p2 = int(tokens[i+2])
+            cond_id, p1, p2 = int(values[i]), int(values[i+1]), int(values[i+2])
         except Exception:
-            raise ValueError(f"Bad condition numeric triplet: {tokens[i:i+3]} in events tokens={tokens}")
+            raise ValueError(f"Bad condition numeric triplet: {_stripped(values[i:i+3])} in events tokens={_stripped(values[1:])}")
         i += 3
         p3 = None
-        if i < len(tokens) and not _int_re.match(tokens[i]):
-            p3 = tokens[i]
-            i += 1
-        conditions.append(EventCondition(cond_id=cond_id, p1=p1, p2=p2, p3=p3))
-        if len(conditions) == num:
+        if i < n:
+            tok = values[i].strip()
+            if not _m(tok):
+                p3 = tok
+                i += 1
+        if c < size:
+            conditions[c] = EventCondition(cond_id, p1, p2, p3)
+        c += 1
+        if c == num:
             break
-    if len(conditions) != num:
-        raise ValueError(f"Events NUM={num} but parsed {len(conditions)} conditions. tokens={tokens}")
+    if c != num:
+        raise ValueError(f"Events NUM={num} but parsed {c} conditions. tokens={_stripped(values[1:])}")
     row = EventRow(
         id=id_key,
         num=num,
         conditions=conditions,
-        source=SourceLoc(_SECTION_EVENTS, line_no),
+        source=(_SID_EVENTS, line_no),
     )
     res.events[id_key] = row
 
@@ -245,40 +312,196 @@ def _parse_action_line(id_key: str, values: List[str], line_no: int, res: ParseR
     try:
         num = int(values[0])
     except Exception:
-        raise ValueError(f"Actions NUM must be int, got '{values[0]}'")
-    tokens = values[1:]
+        raise ValueError(f"Actions NUM must be int, got '{values[0].strip()}'")
     needed = num * 8
-    if len(tokens) != needed:
-        raise ValueError(f"Actions expects {needed} tokens after NUM for {num} actions, got {len(tokens)}")
+    if len(values) - 1 != needed:
+        raise ValueError(f"Actions expects {needed} tokens after NUM for {num} actions, got {len(values) - 1}")
+    # 长度已校验为 1 + 8*num，每条动作直接按偏移取 8 个值，不再逐条切片。
+    # 不用 NumPy 向量化：参数混有 8 位零填充 ID 与字符串，只能放进 object 数组，
+    # np.char 在 object 数组上同样逐元素回调 Python，且单行动作数通常只有几十条。
+    v = values
+    tk = _to_int_or_str
     actions: List[ActionEntry] = []
-    j = 0
-    for k in range(num):
-        chunk = tokens[j:j+8]
-        j += 8
-        if len(chunk) != 8:
-            raise ValueError(f"Incomplete action chunk at action #{k+1}: {chunk}")
+    for off in range(1, 1 + needed, 8):
         try:
-            act_id = int(chunk[0])
+            act_id = int(v[off])
         except Exception:
-            raise ValueError(f"Action ID must be int, got '{chunk[0]}'")
-        params = [_to_int_or_str(tok) for tok in chunk[1:]]
-        entry = ActionEntry(
-            act_id=act_id,
-            p1=params[0], p2=params[1], p3=params[2], p4=params[3],
-            p5=params[4], p6=params[5], p7=params[6]
-        )
-        actions.append(entry)
+            raise ValueError(f"Action ID must be int, got '{v[off].strip()}'")
+        actions.append(ActionEntry(
+            act_id,
+            tk(v[off+1]), tk(v[off+2]), tk(v[off+3]), tk(v[off+4]),
+            tk(v[off+5]), tk(v[off+6]), tk(v[off+7])
+        ))
     row = ActionRow(
         id=id_key,
         num=num,
         actions=actions,
-        source=SourceLoc(_SECTION_ACTIONS, line_no),
+        source=(_SID_ACTIONS, line_no),
     )
     res.actions[id_key] = row
 
-def parse_map_file(path: str) -> ParseResult:
-    text = Path(path).read_text(encoding="utf-8", errors="ignore")
-    return parse_map_text(text)
+# 解析结果的格式变了就加一，让旧的 .map.cache 失效
+# （3：改存纯元组；之前的缓存里是类实例）
+_CACHE_VERSION = 3
+
+def _cache_path(path: str) -> Path:
+    p = Path(path)
+    return p.with_name(p.name + ".cache")
+
+def _pack(pr: ParseResult) -> tuple:
+    """
+    ParseResult -> 只含 str/int/None/tuple/list 的纯数据。
+    pickle 类实例时记下的是类所在模块名：脚本方式运行时是 __main__，
+    import map_parser 的代码（如 open_trigger_graphs 的解析进程池）就读不回来；纯数据没有这个问题。
+    """
+    return (
+        [(k, r.id, r.house, r.linked_trigger, r.name, r.disabled, r.easy, r.normal,
+          r.hard, r.persistence, r.source) for k, r in pr.triggers.items()],
+        [(k, r.id, r.num, [tuple(c) for c in r.conditions], r.source)
+         for k, r in pr.events.items()],
+        [(k, r.id, r.num, [tuple(a) for a in r.actions], r.source)
+         for k, r in pr.actions.items()],
+        [(k, r.id, r.name, r.initial, r.source) for k, r in pr.locals.items()],
+        pr.errors,
+    )
+
+def _unpack(data: tuple) -> ParseResult:
+    triggers, events, actions, locals_, errors = data
+    return ParseResult(
+        triggers={t[0]: TriggerRow(*t[1:]) for t in triggers},
+        events={k: EventRow(i, n, [EventCondition._make(c) for c in conds], src)
+                for k, i, n, conds, src in events},
+        actions={k: ActionRow(i, n, [ActionEntry._make(a) for a in acts], src)
+                 for k, i, n, acts, src in actions},
+        locals={k: LocalVarRow(i, name, initial, src) for k, i, name, initial, src in locals_},
+        errors=errors,
+    )
+
+def parse_map_file(path: str, use_cache: bool = True) -> ParseResult:
+    """
+    解析 .map；结果按 (st_mtime_ns, st_size) pickle 到旁边的 <name>.map.cache，
+    文件未变时直接读缓存，省去重复解析。
+    """
+    if not use_cache:
+        return _parse_map_file(path)
+    st = os.stat(path)
+    key = (_CACHE_VERSION, st.st_mtime_ns, st.st_size)
+    cache = _cache_path(path)
+    try:
+        with cache.open("rb") as f:
+            cached_key, data = pickle.load(f)
+        if cached_key == key:
+            return _unpack(data)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError,
+            pickle.UnpicklingError):
+        pass  # 无缓存、缓存损坏或旧格式（里面的类可能导入不到）：重新解析
+    pr = _parse_map_file(path)
+    tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            pickle.dump((key, _pack(pr)), f, protocol=5)
+        os.replace(tmp, cache)
+    except OSError:
+        # 缓存只是加速手段，写失败（只读目录、磁盘满等）不影响解析
+        try:
+            tmp.unlink(missing_ok=True)
+        except OSError:
+            pass
+    return pr
+
+def _parse_map_file(path: str) -> ParseResult:
+    # 只读映射文件，正则直接扫描页缓存里的字节，省掉整文件读入和 UTF-8 解码
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件无法映射
+            return ParseResult()
+        with mm:
+            return parse_map_bytes(mm)
+
+def parse_many(paths: List[str], workers: Optional[int] = None,
+               use_cache: bool = True) -> List[ParseResult]:
+    """
+    Parse several .map files in worker processes (the parse loop is pure Python,
+    so threads would serialize on the GIL). Results keep the order of `paths`.
+    """
+    if len(paths) < 2:
+        return [parse_map_file(p, use_cache) for p in paths]
+    workers = min(len(paths), workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(parse_map_file, paths, [use_cache] * len(paths)))
+
+def _source_dict(src: SourceLoc) -> Dict[str, Any]:
+    return {"section": _SECTION_NAMES[src[0]], "line": src[1]}
+
+def _trigger_dict(v: TriggerRow) -> Dict[str, Any]:
+    return {
+        "id": v.id,
+        "house": v.house,
+        "linked_trigger": v.linked_trigger,
+        "name": v.name,
+        "disabled": v.disabled,
+        "easy": v.easy,
+        "normal": v.normal,
+        "hard": v.hard,
+        "persistence": v.persistence,
+        "source": _source_dict(v.source)
+    }
+
+def _event_dict(v: EventRow) -> Dict[str, Any]:
+    return {
+        "id": v.id,
+        "num": v.num,
+        "conditions": [c._asdict() for c in v.conditions],
+        "source": _source_dict(v.source)
+    }
+
+def _action_dict(v: ActionRow) -> Dict[str, Any]:
+    return {
+        "id": v.id,
+        "num": v.num,
+        "actions": [a._asdict() for a in v.actions],
+        "source": _source_dict(v.source)
+    }
+
+def _local_dict(v: LocalVarRow) -> Dict[str, Any]:
+    return {
+        "id": v.id,
+        "name": v.name,
+        "initial": v.initial,
+        "source": _source_dict(v.source)
+    }
+
+def _dumps_bytes(obj: Any) -> bytes:
+    """
+    等价于 json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")。
+    orjson 不支持超出 64 位的整数，遇到时退回标准库。
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def _stream_dict(path: str, rows: Dict[str, Any], value_fn) -> None:
+    """
+    与 json.dump({k: value_fn(v) ...}, indent=2) 输出逐字节相同，但逐条序列化写出，
+    不在内存里先拼出整份 dict-of-dicts。
+    """
+    with open(path, "wb") as f:
+        if not rows:
+            f.write(b"{}")
+            return
+        sep = b"{\n  "
+        for k, v in rows.items():
+            f.write(sep)
+            f.write(_dumps_bytes(k))
+            f.write(b": ")
+            # 子对象整体再缩进一层；JSON 字符串里的换行已被转义，替换是安全的
+            f.write(_dumps_bytes(value_fn(v)).replace(b"\n", b"\n  "))
+            sep = b",\n  "
+        f.write(b"\n}")
 
 def dump_json(pr: ParseResult, out_base: str) -> tuple[str, str, str, str, str]:
     """
@@ -298,61 +521,42 @@ def dump_json(pr: ParseResult, out_base: str) -> tuple[str, str, str, str, str]:
     locals_path   = str(base.with_name(base.name + "_locals.json"))   # NEW
     report_path   = str(base.with_name(base.name + "_report.json"))
 
-    with open(triggers_path, "w", encoding="utf-8") as f:
-        json.dump({k: asdict(v) for k, v in pr.triggers.items()}, f, ensure_ascii=False, indent=2)
-
-    with open(events_path, "w", encoding="utf-8") as f:
-        json.dump({k: {
-            "id": v.id,
-            "num": v.num,
-            "conditions": [asdict(c) for c in v.conditions],
-            "source": asdict(v.source)
-        } for k, v in pr.events.items()}, f, ensure_ascii=False, indent=2)
-
-    with open(actions_path, "w", encoding="utf-8") as f:
-        json.dump({k: {
-            "id": v.id,
-            "num": v.num,
-            "actions": [asdict(a) for a in v.actions],
-            "source": asdict(v.source)
-        } for k, v in pr.actions.items()}, f, ensure_ascii=False, indent=2)
-
-    # NEW: locals
-    with open(locals_path, "w", encoding="utf-8") as f:
-        json.dump({k: {
-            "id": v.id,
-            "name": v.name,
-            "initial": v.initial,
-            "source": asdict(v.source)
-        } for k, v in pr.locals.items()}, f, ensure_ascii=False, indent=2)
-
-    with open(report_path, "w", encoding="utf-8") as f:
-        json.dump({"errors": pr.errors}, f, ensure_ascii=False, indent=2)
+    _stream_dict(triggers_path, pr.triggers, _trigger_dict)
+    _stream_dict(events_path, pr.events, _event_dict)
+    _stream_dict(actions_path, pr.actions, _action_dict)
+    _stream_dict(locals_path, pr.locals, _local_dict)  # NEW: locals
+
+    Path(report_path).write_bytes(_dumps_bytes({"errors": pr.errors}))
 
     return triggers_path, events_path, actions_path, locals_path, report_path
 
 def _main(argv: List[str]) -> int:
     import argparse
     ap = argparse.ArgumentParser(description="Parse [Triggers]/[Events]/[Actions]/[VariableNames] from a Mental Omega .map file")
-    ap.add_argument("input", help=".map file path")
+    ap.add_argument("input", nargs="+", help=".map file path(s); several files are parsed in parallel")
     ap.add_argument("--out-base", default=None,
                     help="Optional output file base path (prefix). If omitted, will use ./data/maps/<map_name>/<map_name>")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="Ignore and do not write the <map>.map.cache parse cache")
     args = ap.parse_args(argv)
-    pr = parse_map_file(args.input)
-    if args.out_base:
-        out_base = Path(args.out_base)
-    else:
-        out_dir = make_output_dir_for_map(args.input)
-        out_base = out_dir / Path(args.input).stem
-    t,e,a,l,r = dump_json(pr, str(out_base))
-    print("Wrote:")
-    print(t); print(e); print(a); print(l); print(r)
-    if pr.errors:
-        print("\nParse warnings/errors:")
-        for err in pr.errors[:20]:
-            print(" -", err)
-        if len(pr.errors) > 20:
-            print(f"... and {len(pr.errors)-20} more")
+    if args.out_base and len(args.input) > 1:
+        ap.error("--out-base can only be used with a single input file")
+    results = parse_many(args.input, use_cache=not args.no_cache)
+    for path, pr in zip(args.input, results):
+        if args.out_base:
+            out_base = Path(args.out_base)
+        else:
+            out_dir = make_output_dir_for_map(path)
+            out_base = out_dir / Path(path).stem
+        t,e,a,l,r = dump_json(pr, str(out_base))
+        print("Wrote:")
+        print(t); print(e); print(a); print(l); print(r)
+        if pr.errors:
+            print("\nParse warnings/errors:")
+            for err in pr.errors[:20]:
+                print(" -", err)
+            if len(pr.errors) > 20:
+                print(f"... and {len(pr.errors)-20} more")
     return 0
 
 if __name__ == "__main__":
@@ -15,9 +15,22 @@ The script:
 
 This is a simple, cross-platform helper intended for local use.
 """
-import os, sys, subprocess, webbrowser, time, threading
+import os, re, sys, json, mmap, signal, subprocess, webbrowser, time, threading
+import itertools, multiprocessing
+import http.client, http.server, urllib.parse
+from bisect import bisect_left
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait as futures_wait
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
+# 可选：orjson 解析 JSON 比标准库快数倍；未安装则退回 json.loads（两者都接受 bytes）
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
 # --- simple ANSI colors (work in most modern terminals, including PowerShell) ---
 RESET = "\033[0m"
 FG_GREEN = "\033[92m"
@@ -26,6 +39,23 @@ FG_RED = "\033[91m"
 FG_CYAN = "\033[96m"
 FG_MAGENTA = "\033[95m"
 
+# Windows 控制台：执行一次空命令会让 conhost 开启 VT 处理，ANSI 颜色由终端直接解释
+if os.name == 'nt':
+    os.system('')
+
+def ask(prompt):
+    """
+    input() 的精简版：写出提示后直接 sys.stdin.readline()。
+    菜单只需要一两个字符的回答，用不到 input() 的行编辑/补全钩子；
+    与 input() 一样，读到 EOF 时抛 EOFError，不会在空串上死循环。
+    """
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip('\n')
+
 # --- colored print helpers ---
 def cyan_msg(msg):      print(FG_CYAN   + msg + RESET)   # for info
 def green_msg(msg):     print(FG_GREEN  + msg + RESET)   # for success
@@ -36,130 +66,296 @@ ROOT = Path(__file__).resolve().parents[1]
 MAPS_DIR = ROOT / 'data' / 'maps'
 if not MAPS_DIR.exists():
     MAPS_DIR = ROOT / 'maps'
+# MAPS_DIR 相对仓库根的 URL 前缀，条目的 rel_url 直接拼接，打开时不再 relative_to
+_MAPS_URL = MAPS_DIR.relative_to(ROOT).as_posix()
+
+# 辅助脚本的位置在会话中不会变，导入时解析一次，之后每次生成/修复不再逐个 exists()
+_MAP_PARSER_CANDIDATES = (
+    Path(__file__).parent / 'map_parser.py',
+    ROOT / 'map_parser.py',
+    ROOT / 'tools' / 'map_parser.py',
+)
+_MAP_PARSER_PATH = next((c for c in _MAP_PARSER_CANDIDATES if c.exists()), None)
+_VISUALIZE_PATH = ROOT / 'tools' / 'visualize_triggers.py'
+if not _VISUALIZE_PATH.exists():
+    _VISUALIZE_PATH = ROOT / 'visualize_triggers.py'
 
 HTTP_PORT = 8999
 
 TOOL_VERSION = '1.4.2'
 
+# 地图目录里三类产物的文件名后缀
+_SUFFIX_HTML = '_trigger_graph.html'
+_SUFFIX_NODES = '_node_details.json'
+_SUFFIX_DEBUG = '_debug.json'
 
-def find_graphs():
+
+def _scan_dir(map_dir):
+    """一次 scandir 得到目录快照 {文件名: os.DirEntry}；目录不存在时为空。"""
+    try:
+        with os.scandir(map_dir) as it:
+            return {e.name: e for e in it}
+    except FileNotFoundError:
+        return {}
+
+
+def _scan_sub(sub):
+    """
+    一次 scandir 把子目录里的文件按后缀分桶，代替三次 glob + 逐个 exists()。
+    同时返回整个目录快照，缓存状态等检查直接复用，不必再扫一遍。
+    """
+    present = _scan_dir(sub)
+    htmls, nodes, debugs = [], [], []
+    # 切片 + == 比 endswith 少一次方法查找与参数解析；后缀与长度先绑成局部变量
+    sh, sn, sd = _SUFFIX_HTML, _SUFFIX_NODES, _SUFFIX_DEBUG
+    lh, ln, ld = -len(sh), -len(sn), -len(sd)
+    for n in present:
+        if n[lh:] == sh:
+            htmls.append(n)
+        elif n[ln:] == sn:
+            nodes.append(n)
+        elif n[ld:] == sd:
+            debugs.append(n)
+    return htmls, nodes, debugs, present
+
+
+def _map_entries(name, dir_mtime_ns=None):
+    """
+    扫描单个地图目录 MAPS_DIR/<name>，返回它在 find_graphs 里对应的条目（通常一条）。
+    生成完单张图后直接用它取新条目，不必重扫整个 MAPS_DIR。
+    dir_mtime_ns：find_graphs 扫描时顺手拿到的目录 mtime，list_maps 用它做整行状态的记忆键。
+    """
     out = []
-    if not MAPS_DIR.exists():
-        return out
-    for sub in sorted(MAPS_DIR.iterdir()):
-        if not sub.is_dir():
-            continue
-        # determine presence of html / node_details / debug
-        htmls = list(sub.glob('*_trigger_graph.html'))
-        nodes = list(sub.glob('*_node_details.json'))
-        debugs = list(sub.glob('*_debug.json'))
-        if htmls:
-            for p in htmls:
-                nd = p.with_name(p.stem + '_node_details.json')
-                dbg = p.with_name(p.stem + '_debug.json')
-                out.append({
-                    'map': sub.name,
-                    'html': p,
-                    'node_json': nd,
-                    'debug_json': dbg,
-                    'has_html': True,
-                    'has_node': nd.exists(),
-                    'has_debug': dbg.exists(),
-                })
-        else:
-            # no html present: but maybe json exist
-            nd = nodes[0] if nodes else None
-            dbg = debugs[0] if debugs else None
+    sub = MAPS_DIR / name
+    url_dir = f'{_MAPS_URL}/{name}/'
+    # determine presence of html / node_details / debug
+    htmls, nodes, debugs, present = _scan_sub(sub)
+    if htmls:
+        # 目录快照本身就是 {文件名: DirEntry}，存在性直接查它，不必再建集合
+        for fn in htmls:
+            stem = fn[:-len('.html')]
+            nd_name = stem + _SUFFIX_NODES
+            dbg_name = stem + _SUFFIX_DEBUG
             out.append({
-                'map': sub.name,
-                'html': None,
-                'node_json': nd,
-                'debug_json': dbg,
-                'has_html': False,
-                'has_node': bool(nd),
-                'has_debug': bool(dbg),
+                'map': name,
+                'html': sub / fn,
+                'rel_url': url_dir + fn,
+                'node_json': sub / nd_name,
+                'debug_json': sub / dbg_name,
+                'has_html': True,
+                'has_node': nd_name in present,
+                'has_debug': dbg_name in present,
+                'dir_entries': present,
+                'dir_mtime_ns': dir_mtime_ns,
             })
+    else:
+        # no html present: but maybe json exist
+        nd = sub / nodes[0] if nodes else None
+        dbg = sub / debugs[0] if debugs else None
+        out.append({
+            'map': name,
+            'html': None,
+            'rel_url': None,
+            'node_json': nd,
+            'debug_json': dbg,
+            'has_html': False,
+            'has_node': bool(nd),
+            'has_debug': bool(dbg),
+            'dir_entries': present,
+            'dir_mtime_ns': dir_mtime_ns,
+        })
     return out
 
 
+# ((子目录名, mtime_ns) 元组, 条目列表)；菜单每刷新一次都会调用 find_graphs
+_GRAPHS_CACHE = None
+
+
+def find_graphs():
+    """
+    扫描 MAPS_DIR 下各地图目录。结果按各子目录的 (名字, mtime) 记忆：
+    子目录增删或其中文件增删都会让键变化，否则直接复用上次的条目，省掉逐个子目录的 scandir。
+    """
+    global _GRAPHS_CACHE
+    try:
+        with os.scandir(MAPS_DIR) as it:
+            subs = sorted((e.name, e.stat().st_mtime_ns) for e in it if e.is_dir())
+    except FileNotFoundError:
+        return []
+    key = tuple(subs)
+    if _GRAPHS_CACHE is not None and _GRAPHS_CACHE[0] == key:
+        return _GRAPHS_CACHE[1]
+    out = []
+    for name, mtime in subs:
+        out += _map_entries(name, mtime)
+    _GRAPHS_CACHE = (key, out)
+    return out
+
+
+# visualize_triggers 把 tool_version 写在 debug JSON 的末尾（只在 map_name 之前），
+# 前面是体积很大的 node_weight/edge_weight；因此通常只看文件尾部就能取到版本号。
+# 转义后的字符串值里不会出现紧跟 tool_version 的裸引号，所以不会误命中嵌套内容。
+_TOOL_VERSION_RE = re.compile(rb'"tool_version"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_PEEK_BYTES = 8192
+# str(path) -> ((mtime_ns, size), version)
+_VERSION_CACHE = {}
+
+
+def _peek_tool_version(path):
+    """
+    读取 *_debug.json 里的 tool_version（缺失或非字符串时返回 None），不构建 JSON 对象。
+    文件只读映射后由正则在 C 层扫描：先看尾部，没有再扫全文件。结果按 (mtime_ns, size) 记忆。
+    """
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _VERSION_CACHE.get(str(path))
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    ver = None
+    if st.st_size:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # 顶层 tool_version 是最后一次出现，取最后一个匹配
+            m = None
+            for m in _TOOL_VERSION_RE.finditer(mm, max(0, len(mm) - _PEEK_BYTES)):
+                pass
+            if m is None:
+                for m in _TOOL_VERSION_RE.finditer(mm):
+                    pass
+            if m is not None:
+                # 各地图的版本号通常只有一两种：驻留后共享同一对象，
+                # _parse_version 的 lru_cache 查找也能直接走 is 比较
+                ver = sys.intern(_loads(b'"' + m.group(1) + b'"'))
+    _VERSION_CACHE[str(path)] = (key, ver)
+    return ver
+
+
+# 主菜单选项是固定文本，拼好后一次写出
+_OPTIONS_MENU = (
+    '\nOptions:\n'
+    f'  Enter {FG_CYAN}index number{RESET} to open that graph\n'
+    f"  Enter {FG_CYAN}'g'{RESET} to list .map files and (re)generate graphs\n"
+    f"  Enter {FG_CYAN}'q'{RESET} to quit\n"
+)
+
+# 状态只有有限几种，上好色的字符串在导入时一次拼好。
+# 'COMPLETE'、'CACHED' 这类标识符形式的字面量编译时已被 CPython 驻留，不必再包 sys.intern
+_COMPLETE_COLORED = {
+    'COMPLETE':     FG_GREEN  + 'COMPLETE'     + RESET,
+    'MISSING_JSON': FG_YELLOW + 'MISSING_JSON' + RESET,
+    'MISSING_HTML': FG_YELLOW + 'MISSING_HTML' + RESET,
+    'ALL_MISSING':  FG_YELLOW + 'ALL_MISSING'  + RESET,
+}
+_CACHE_COLORED = {
+    'CACHED':         FG_GREEN  + 'CACHED'         + RESET,
+    'CACHE_OUTDATED': FG_YELLOW + 'CACHE_OUTDATED' + RESET,
+    'NOT_CACHED':     FG_RED    + 'NOT_CACHED'     + RESET,
+}
+# 版本号是动态的，只预拼前缀；后接 file_ver + RESET
+_VER_OUTDATED = FG_RED + 'OUTDATED v'
+_VER_NEWER = FG_CYAN + 'NEWER v'
+_VER_CURRENT = FG_GREEN + 'v'
+# [index] map: html (complete) (version) (cache)
+_ENTRY_LINE = f"[{FG_CYAN}{{}}{RESET}] {FG_MAGENTA}{{}}{RESET}: {{}} ({{}}) ({{}}) ({{}})"
+
+
+# (地图名, html 文件名) -> (键, 状态行)；键见 _entry_status
+_ROW_CACHE = {}
+
+
+def _entry_status(e, index=None, mapfile_memo=None):
+    """
+    计算列表中一条的 (完整性, 上好色的版本串, 缓存状态)。
+    整行按 (地图目录 mtime, debug JSON 的 mtime/size, .map mtime) 记忆：目录 mtime 管文件增删，
+    另两项管原地改写（不一定会更新目录 mtime）。命中时只需 stat debug 与 .map 各一次。
+    """
+    mapname = e['map']
+    mapfile_stat = _mapfile_stat(mapname, mapfile_memo, index)
+    row_id = key = None
+    if e.get('dir_mtime_ns') is not None:
+        dbg_key = None
+        if e['has_debug']:
+            try:
+                st = os.stat(e['debug_json'])
+                dbg_key = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass
+        row_id = (mapname, e['html'].name if e['html'] else None)
+        key = (e['dir_mtime_ns'], dbg_key, mapfile_stat[1])
+        hit = _ROW_CACHE.get(row_id)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+
+    has_html = bool(e['has_html'])
+    has_node = bool(e['has_node'])
+    has_debug = bool(e['has_debug'])
+
+    # 1) 完整性
+    if has_html and has_node and has_debug:
+        complete_status = 'COMPLETE'
+    elif has_html and not (has_node or has_debug):
+        complete_status = 'MISSING_JSON'
+    elif not has_html and (has_node or has_debug):
+        complete_status = 'MISSING_HTML'
+    else:
+        complete_status = 'ALL_MISSING'
+
+    # 2) 版本（直接产出上好色的字符串）
+    version_str = 'UNKNOWN'
+    dbg_path = e.get('debug_json')
+    if e['has_debug']:
+        try:
+            file_ver = _peek_tool_version(dbg_path)
+            if isinstance(file_ver, str) and file_ver.strip():
+                fv = _parse_version(file_ver)
+                if fv < _TOOL_VERSION_TUPLE:
+                    version_str = _VER_OUTDATED + file_ver + RESET
+                elif fv > _TOOL_VERSION_TUPLE:
+                    version_str = _VER_NEWER + file_ver + RESET
+                else:
+                    version_str = _VER_CURRENT + file_ver + RESET
+        except Exception:
+            version_str = 'UNKNOWN'
+
+    # 3) 缓存状态
+    map_dir = e['html'].parent if e.get('html') else (MAPS_DIR / mapname)
+    cache_status = _cache_status(map_dir, mapname, e['dir_entries'], mapfile_stat)
+    row = (complete_status, version_str, cache_status)
+    if row_id is not None:
+        _ROW_CACHE[row_id] = (key, row)
+    return row
+
+
 def list_maps():
     maps = find_graphs()
-    print(f"\nCurrent version of the tool: {FG_CYAN}v{TOOL_VERSION}{RESET}")
+    header = f"\nCurrent version of the tool: {FG_CYAN}v{TOOL_VERSION}{RESET}"
     if not maps:
+        print(header)
         yellow_msg('No generated trigger_graph HTML found under ' + str(MAPS_DIR))
         return maps
 
-    print('\nFound trigger graphs:')
-    import json
-
-    for i, e in enumerate(maps):
-        has_html = bool(e['has_html'])
-        has_node = bool(e['has_node'])
-        has_debug = bool(e['has_debug'])
-
-        # 1) 完整性
-        if has_html and has_node and has_debug:
-            complete_status = 'COMPLETE'
-        elif has_html and not (has_node or has_debug):
-            complete_status = 'MISSING_JSON'
-        elif not has_html and (has_node or has_debug):
-            complete_status = 'MISSING_HTML'
-        else:
-            complete_status = 'ALL_MISSING'
-
-        # 2) 版本
-        version_status = 'UNKNOWN'
-        dbg_path = e.get('debug_json')
-        if dbg_path and Path(dbg_path).exists():
-            try:
-                with open(dbg_path, 'r', encoding='utf-8') as f:
-                    dbg = json.load(f)
-                file_ver = dbg.get('tool_version')
-                if isinstance(file_ver, str) and file_ver.strip():
-                    cmp = compare_version(file_ver, TOOL_VERSION)
-                    if cmp < 0:
-                        version_status = f'OUTDATED v{file_ver}'
-                    elif cmp > 0:
-                        version_status = f'NEWER v{file_ver}'
-                    else:
-                        version_status = f'v{file_ver}'
-            except Exception:
-                version_status = 'UNKNOWN'
-
-        # 3) 缓存状态
-        mapname = e['map']
-        map_dir = e['html'].parent if e.get('html') else (MAPS_DIR / mapname)
-        cache_status = _cache_status(map_dir, mapname)
-
+    lines = [header, '\nFound trigger graphs:']
+    # 整个列表共用一份 .map 索引（只 stat 一次 ROOT），每个 .map 也只 stat 一次
+    rows = map(partial(_entry_status, index=_mapfile_index(), mapfile_memo={}), maps)
+    for i, (e, (complete_status, version_str, cache_status)) in enumerate(zip(maps, rows)):
         name = e['html'].name if e['html'] else '<no html>'
+        lines.append(_ENTRY_LINE.format(
+            i, e['map'], name,
+            _COMPLETE_COLORED[complete_status], version_str, _CACHE_COLORED[cache_status]))
 
-        # 状态上个色，例子：
-        if complete_status == 'COMPLETE':
-            complete_str = FG_GREEN + complete_status + RESET
-        else:
-            complete_str = FG_YELLOW + complete_status + RESET
-
-        if 'OUTDATED' in version_status:
-            version_str = FG_RED + version_status + RESET
-        elif 'NEWER' in version_status:
-            version_str = FG_CYAN + version_status + RESET
-        elif version_status.startswith('v'):
-            version_str = FG_GREEN + version_status + RESET
-        else:
-            version_str = version_status
+    # 表头和整个列表一次写出
+    sys.stdout.write('\n'.join(lines) + '\n')
+    sys.stdout.flush()
 
-        if cache_status == 'CACHED':
-            cache_str = FG_GREEN + cache_status + RESET
-        elif cache_status == 'CACHE_OUTDATED':
-            cache_str = FG_YELLOW + cache_status + RESET
-        else:  # NOT_CACHED
-            cache_str = FG_RED + cache_status + RESET
+    return maps
 
-        print(f"[{FG_CYAN}{i}{RESET}] {FG_MAGENTA}{e['map']}{RESET}: {name} "
-            f"({complete_str}) ({version_str}) ({cache_str})")
 
-
-    return maps
+@lru_cache(maxsize=256)
+def _parse_version(s: str) -> tuple:
+    """'1.4.2' -> (1, 4, 2)；去掉末尾的 0，使 tuple 比较等价于补 0 后逐段比较。"""
+    parts = [int(x) for x in s.split('.') if x.isdigit()]
+    while parts and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
 
 
 def compare_version(a: str, b: str) -> int:
@@ -169,70 +365,99 @@ def compare_version(a: str, b: str) -> int:
       0  if a == b
      -1  if a < b
     """
-    pa = [int(x) for x in a.split('.') if x.isdigit()]
-    pb = [int(x) for x in b.split('.') if x.isdigit()]
-    for i in range(max(len(pa), len(pb))):
-        va = pa[i] if i < len(pa) else 0
-        vb = pb[i] if i < len(pb) else 0
-        if va > vb: return 1
-        if va < vb: return -1
-    return 0
+    pa, pb = _parse_version(a), _parse_version(b)
+    return (pa > pb) - (pa < pb)
+
+
+# 本工具版本只解析一次；列表与打开前的检查直接和它做 tuple 比较
+_TOOL_VERSION_TUPLE = _parse_version(TOOL_VERSION)
+
+class _QuietHTTPServer(http.server.ThreadingHTTPServer):
+    """与原先子进程 stderr 丢进 DEVNULL 一致：浏览器断开等异常不往控制台打 traceback。"""
+
+    def handle_error(self, request, client_address):
+        pass
+
 
 def start_http_server(root, port=HTTP_PORT):
+    """
+    在本进程的后台线程里起 HTTP 服务器，省掉再启动一个 Python 解释器（约 0.1s）。
+    构造函数返回时端口已在 listen，打开浏览器前不必再等。绑定失败（端口被占用）返回 None。
+    """
     # 使用自定义的 trigger_http_server.py，既能静态服务也能接收布局 POST
-    server_script = Path(__file__).parent / 'trigger_http_server.py'
-    if not server_script.exists():
+    try:
+        from trigger_http_server import TriggerHandler as base
+        kwargs = {}
+    except ImportError:
         # 兜底：如果脚本不存在，仍然用简单 http.server
-        cmd = [sys.executable, '-m', 'http.server', str(port)]
+        base = http.server.SimpleHTTPRequestHandler
+        kwargs = {'directory': str(root)}
         print(
             f"{FG_CYAN}Starting simple HTTP server at {FG_MAGENTA}http://localhost:{port}/ "
             f"({FG_CYAN}serving {FG_MAGENTA}{root}{FG_CYAN}) [no layout autosave]{RESET}"
-        )    
+        )
     else:
-        cmd = [sys.executable, str(server_script), str(port)]
         print(
             f"{FG_CYAN}Starting Trigger HTTP server at {FG_MAGENTA}http://localhost:{port}/ "
             f"(serving {FG_MAGENTA}{root}{FG_CYAN}){RESET}"
         )
 
-    return subprocess.Popen(
-        cmd,
-        cwd=str(root),
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL
-    )
+    class Handler(base):
+        # 每个请求的访问日志会和交互菜单混在一起，同原来一样不输出
+        def log_message(self, format, *args):
+            pass
 
-def _has_cache_files(map_dir: Path, mapname: str) -> bool:
+    try:
+        srv = _QuietHTTPServer(("", port), partial(Handler, **kwargs))
+    except OSError as e:
+        red_msg(f"Cannot start HTTP server on port {port}: {e}")
+        return None
+    # poll_interval 决定退出时 shutdown() 最多等多久，默认 0.5s 太长
+    threading.Thread(target=srv.serve_forever, kwargs={'poll_interval': 0.1}, daemon=True).start()
+    return srv
+
+def _warm_server(entry):
     """
-    简单判断该地图目录下是否存在布局缓存文件。
-    你可以根据实际情况调整候选文件名。
+    打开浏览器前先用一条连接对 HTML / node_details / debug 发 HEAD，
+    让刚启动的本地服务器先跑一遍路径解析与处理代码，浏览器随后的请求不必再等它预热。
+    服务器说的是 HTTP/1.0，连接用完即关，不能一直占着。
     """
-    candidates = [
-        map_dir / f"{mapname}_layout_cache.json",
-        map_dir / f"{mapname}_layout.json",
-        map_dir / "layout_cache.json",
-    ]
-    return any(p.exists() for p in candidates)
+    # 三个文件同在一个目录，用 rel_url 的目录部分拼上文件名即可
+    url_dir = entry['rel_url'].rpartition('/')[0]
+    paths = []
+    for key in ('html', 'node_json', 'debug_json'):
+        p = entry.get(key)
+        if p:
+            paths.append('/' + urllib.parse.quote(f'{url_dir}/{p.name}'))
+    conn = http.client.HTTPConnection('localhost', HTTP_PORT, timeout=1)
+    try:
+        for path in paths:
+            conn.request('HEAD', path)
+            conn.getresponse().read()
+    except (OSError, http.client.HTTPException):
+        pass  # 预热只是锦上添花，失败就让浏览器自己去请求
+    finally:
+        conn.close()
+
 
 def open_graph_entry(entry, skip_physics: bool = False):
     """Open the given graph entry in browser.
     If skip_physics=True, append ?skip_physics=1 so HTTP server can disable vis physics on load.
     """
-    # ensure files are in place
-    html = entry['html']
-    rel = html.relative_to(ROOT)
+    rel_url = entry['rel_url']
 
     if skip_physics:
-        url = f'http://localhost:{HTTP_PORT}/{rel.as_posix()}?skip_physics=1'
+        url = f'http://localhost:{HTTP_PORT}/{rel_url}?skip_physics=1'
     else:
-        url = f'http://localhost:{HTTP_PORT}/{rel.as_posix()}'
+        url = f'http://localhost:{HTTP_PORT}/{rel_url}'
         
     print(f"{FG_CYAN}Opening {FG_MAGENTA}{url}{FG_CYAN}...{RESET}")
+    _warm_server(entry)
     webbrowser.open(url)
 
-def _find_cache_files(map_dir: Path, mapname: str):
+def _cache_entries(map_dir: Path, mapname: str, present=None):
     """
-    返回该地图目录下可能的布局缓存文件列表。
+    返回该地图目录下可能的布局缓存文件（os.DirEntry 列表）。
     目前已知命名：<mapname>_layout.json
     同时预留几种扩展写法：
       - <mapname>_layout.json
@@ -240,73 +465,104 @@ def _find_cache_files(map_dir: Path, mapname: str):
       - <mapname>_layout_cache*.json
       - layout_cache*.json
     """
-    patterns = [
-        f"{mapname}_layout.json",
-        f"{mapname}_layout_*.json",
-        f"{mapname}_layout_cache*.json",
-        "layout_cache*.json",
-    ]
+    # 一次 scandir + 字符串前后缀判断，代替四次 glob 再去重
+    # （<mapname>_layout_cache*.json 已被 <mapname>_layout_*.json 覆盖）
+    # present：调用方已有的目录快照（_scan_dir），没有才现扫
+    if present is None:
+        present = _scan_dir(map_dir)
+    exact = f"{mapname}_layout.json"
+    prefix = f"{mapname}_layout_"
     files = []
-    for pat in patterns:
-        files.extend(map_dir.glob(pat))
-    # 去重
-    return list({p for p in files if p.exists()})
+    for n, e in present.items():
+        if n[-5:] != '.json':
+            continue
+        if n == exact or n.startswith(prefix) or n.startswith('layout_cache'):
+            if e.is_file():
+                files.append(e)
+    return files
+
 
+# str(map_dir) -> ((目录 mtime_ns, .map mtime_ns), 状态)
+_STATUS_CACHE = {}
 
-def _cache_status(map_dir: Path, mapname: str) -> str:
+
+def _cache_status(map_dir: Path, mapname: str, present=None, mapfile_stat=None) -> str:
     """
     返回缓存状态：
       - 'CACHED'
       - 'CACHE_OUTDATED'
       - 'NOT_CACHED'
+    结果按 (地图目录 mtime, .map mtime) 记忆：缓存文件的增删（包括布局保存时的
+    os.replace）都会改变目录 mtime，菜单反复刷新时不必再扫目录、逐个 stat。
+    mapfile_stat：调用方已取得的 _mapfile_stat(mapname) 结果。
     """
-    cache_files = _find_cache_files(map_dir, mapname)
-    if not cache_files:
+    try:
+        dir_mtime = map_dir.stat().st_mtime_ns
+    except OSError:
         return 'NOT_CACHED'
-
-    mapfile = find_mapfile_for(mapname)
-    if mapfile and mapfile.exists():
-        latest_cache_mtime = max(p.stat().st_mtime for p in cache_files)
-        if mapfile.stat().st_mtime > latest_cache_mtime:
-            return 'CACHE_OUTDATED'
-    return 'CACHED'
+    map_mtime = (mapfile_stat or _mapfile_stat(mapname))[1]
+    key = (dir_mtime, map_mtime)
+    hit = _STATUS_CACHE.get(str(map_dir))
+    if hit is not None and hit[0] == key:
+        return hit[1]
+
+    # DirEntry.stat() 会缓存结果；Windows 上直接取自目录枚举，不再额外 stat
+    cache_files = _cache_entries(map_dir, mapname, present)
+    if not cache_files:
+        status = 'NOT_CACHED'
+    elif map_mtime is not None and map_mtime > max(e.stat().st_mtime_ns for e in cache_files):
+        status = 'CACHE_OUTDATED'
+    else:
+        status = 'CACHED'
+    _STATUS_CACHE[str(map_dir)] = (key, status)
+    return status
 
 
-def _collect_source_jsons(map_dir: Path, mapname: str):
+def _source_json_entries(map_dir: Path, mapname: str, present=None):
     """
-    收集 triggers/actions/events/locals 四个源 JSON（带 mapname 前缀或无前缀都尝试）。
-    返回实际存在的文件列表。
+    一次 scandir 收集 triggers/actions/events/locals 四个源 JSON（带 mapname 前缀优先，
+    其次无前缀），返回实际存在的 os.DirEntry 列表；代替逐个 exists() 的 8 次 stat。
     """
+    if present is None:
+        present = _scan_dir(map_dir)
     out = []
     for key in ("triggers", "actions", "events", "locals"):
-        p1 = map_dir / f"{mapname}_{key}.json"
-        p2 = map_dir / f"{key}.json"
-        if p1.exists():
-            out.append(p1)
-        elif p2.exists():
-            out.append(p2)
+        e = present.get(f"{mapname}_{key}.json") or present.get(f"{key}.json")
+        if e is not None:
+            out.append(e)
     return out
 
 
-def _source_outdated(map_dir: Path, mapname: str) -> bool:
+def _collect_source_jsons(map_dir: Path, mapname: str, present=None):
+    """
+    收集 triggers/actions/events/locals 四个源 JSON（带 mapname 前缀或无前缀都尝试）。
+    返回实际存在的文件列表。
+    """
+    return [Path(e.path) for e in _source_json_entries(map_dir, mapname, present)]
+
+
+def _source_outdated(map_dir: Path, mapname: str, src_files=None, mapfile_stat=None) -> bool:
     """
     若 .map 比任何一个源 JSON 更新，则认为源 JSON 过时。
     若 .map 或 4 个 JSON 不齐，则返回 False（交给其它逻辑处理）。
+    src_files / mapfile_stat 为调用方已取得的 _source_json_entries / _mapfile_stat 结果。
     """
-    src_files = _collect_source_jsons(map_dir, mapname)
+    if src_files is None:
+        src_files = _source_json_entries(map_dir, mapname)
     if len(src_files) < 4:
         return False
-    mapfile = find_mapfile_for(mapname)
-    if not (mapfile and mapfile.exists()):
+    map_mtime = (mapfile_stat or _mapfile_stat(mapname))[1]
+    if map_mtime is None:
         return False
-    latest_src_mtime = max(p.stat().st_mtime for p in src_files)
-    return mapfile.stat().st_mtime > latest_src_mtime
+    latest_src_mtime = max(e.stat().st_mtime_ns for e in src_files)
+    return map_mtime > latest_src_mtime
 
 
 def _spawn_background_map_parser(map_name: str, map_dir: Path):
     """在后台调用 map_parser.py 来生成缺失的 JSON。
     返回 (event, result) 其中 event 为 threading.Event，可被等待；result 为 dict，
-    在进程结束后填充 'pid','log_path','written_files'。
+    含 'pid','report_path'，进程结束后填充 'written_files'。
+    子进程输出直接丢进 DEVNULL，不落日志文件，失败时也就没有日志需要回读；详情看 report。
     """
     mapfile = find_mapfile_for(map_name)
     if not mapfile:
@@ -314,25 +570,22 @@ def _spawn_background_map_parser(map_name: str, map_dir: Path):
               f"{FG_MAGENTA}{map_name}{RESET}")
         return None, None
 
-    candidates = [Path(__file__).parent / 'map_parser.py', Path('map_parser.py'), Path('tools') / 'map_parser.py']
-    parser_py = None
-    for c in candidates:
-        if c.exists():
-            parser_py = c
-            break
+    parser_py = _MAP_PARSER_PATH
     if not parser_py:
-        yellow_msg("Could not locate map_parser.py; cannot auto-repair JSON (tried: " + ', '.join(str(c) for c in candidates) + ")")
+        yellow_msg("Could not locate map_parser.py; cannot auto-repair JSON (tried: " + ', '.join(str(c) for c in _MAP_PARSER_CANDIDATES) + ")")
         return None, None
 
-    import subprocess, sys as _sys
-    repo_root = Path(__file__).resolve().parents[1]
-
     # ensure map_dir exists
     map_dir.mkdir(parents=True, exist_ok=True)
 
     try:
         # start subprocess but send its stdout/stderr to DEVNULL so we don't interleave logs
-        proc = subprocess.Popen([_sys.executable, str(parser_py), str(mapfile)], cwd=str(repo_root), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # start_new_session：子进程不在终端的前台进程组里，菜单里按 Ctrl-C 不会把修复一起打断
+        # （Windows 上忽略该参数）。本文件的 Popen 都不带 preexec_fn / shell / 改 uid/gid，
+        # Linux 上 CPython 会用 vfork 起子进程，不必复制父进程页表
+        proc = subprocess.Popen([sys.executable, str(parser_py), str(mapfile)], cwd=str(ROOT),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                start_new_session=True)
     except Exception as e:
         red_msg(f"Failed to start background repair: {e}")
         return None, None
@@ -346,16 +599,11 @@ def _spawn_background_map_parser(map_name: str, map_dir: Path):
         finally:
             pass
         # determine which expected files now exist
+        # 一次 scandir 的目录快照代替五次 exists()
         try:
-            expected = [
-                map_dir / f"{map_name}_triggers.json",
-                map_dir / f"{map_name}_events.json",
-                map_dir / f"{map_name}_actions.json",
-                map_dir / f"{map_name}_locals.json",
-                map_dir / f"{map_name}_report.json",
-            ]
-            written = [str(p) for p in expected if p.exists()]
-            result['written_files'] = written
+            present = _scan_dir(map_dir)
+            expected = [f"{map_name}_{k}.json" for k in ("triggers", "events", "actions", "locals", "report")]
+            result['written_files'] = [str(map_dir / n) for n in expected if n in present]
         except Exception:
             result['written_files'] = []
         done.set()
@@ -366,21 +614,154 @@ def _spawn_background_map_parser(map_name: str, map_dir: Path):
     return done, result
 
 
-def _run_map_parser_sync(map_path: Path, show_progress: bool = True) -> bool:
+# 池进程内：开始执行任务时用来报告 (任务号, pid) 的队列，由 _parser_worker_init 设置
+_JOB_STARTED = None
+
+
+def _parser_worker_init(started):
+    global _JOB_STARTED
+    _JOB_STARTED = started
+    # Ctrl-C 由菜单所在的主进程处理；池进程不忽略的话，空闲进程也会各打一份 KeyboardInterrupt 回溯
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _parse_map_job(map_path: str, job: int) -> None:
+    """在池内进程里执行，效果同 `python map_parser.py <map>`。"""
+    _JOB_STARTED.put((job, os.getpid()))
+    import map_parser
+    pr = map_parser.parse_map_file(map_path)
+    out_dir = map_parser.make_output_dir_for_map(map_path)
+    map_parser.dump_json(pr, str(out_dir / Path(map_path).stem))
+
+
+def _kill_pid(pid):
+    try:
+        os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))  # Windows 上 SIGTERM 即 TerminateProcess
+    except OSError:
+        pass  # 已经退出
+
+
+class _ParserPool:
+    """
+    会话内复用的解析进程池：解释器启动和 map_parser 导入只付一次，"generate ALL" 时还能并行。
+    池进程用 spawn 启动：本进程里有 HTTP 服务器、spinner、生成线程等多个线程，fork 出来的子进程可能卡在锁上。
+    任务开始执行时把 (任务号, pid) 报回来，超时/取消只结束跑这个任务的进程，计时也从真正开始执行算起。
+    注意结束任一池进程都会让 ProcessPoolExecutor 整个报废（其余任务得到 BrokenProcessPool），
+    调用方对此退回一次性子进程重跑。
+    """
+
+    def __init__(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._started_q = ctx.SimpleQueue()
+        self._started = {}  # 任务号 -> pid；谁读到队列谁填，持 _lock
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=ctx,
+                                             initializer=_parser_worker_init,
+                                             initargs=(self._started_q,))
+
+    def _wait_started(self, job, fut, cancel):
+        """等任务在某个池进程里开始执行，返回该进程 pid；任务没开始就结束了（或 cancel 被置位）时返回 None。"""
+        while True:
+            with self._lock:
+                while not self._started_q.empty():
+                    j, pid = self._started_q.get()
+                    self._started[j] = pid
+                pid = self._started.pop(job, None)
+            if pid is not None or fut.done() or (cancel is not None and cancel.is_set()):
+                return pid
+            futures_wait((fut,), timeout=0.005)
+
+    def run(self, map_path: str, timeout, cancel=None) -> bool:
+        """
+        在池里解析一张 .map 并等它结束，成功返回 True。
+        任务开始后 timeout 秒仍未结束：结束其进程并抛 FutureTimeoutError；cancel 被置位：结束其进程并返回 False。
+        任务本身的异常（含 BrokenProcessPool / CancelledError）原样抛出。
+        """
+        job = next(self._ids)
+        fut = self._executor.submit(_parse_map_job, map_path, job)
+        pid = None
+        try:
+            pid = self._wait_started(job, fut, cancel)
+            deadline = time.monotonic() + timeout
+            while not fut.done():
+                if cancel is not None and cancel.is_set():
+                    return False
+                rem = deadline - time.monotonic()
+                if rem <= 0:
+                    raise FutureTimeoutError()
+                futures_wait((fut,), timeout=min(0.05, rem))
+            fut.result()
+            return True
+        finally:
+            # 超时、取消或 Ctrl-C 打断等待：不能只是不等了，卡住的解析会继续占着池位、
+            # 在提示中止后还可能写 JSON，退出时 concurrent.futures 的 atexit 钩子也会一直等它
+            if not fut.done() and not fut.cancel() and pid is not None:
+                _kill_pid(pid)
+                _discard_parser_pool(self)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_PARSER_POOL = None
+_PARSER_POOL_LOCK = threading.Lock()
+
+
+def _parser_pool():
+    # "generate ALL" 时多个线程会同时来取，不加锁的话各自都可能建一个池
+    global _PARSER_POOL
+    with _PARSER_POOL_LOCK:
+        if _PARSER_POOL is None:
+            _PARSER_POOL = _ParserPool()
+        return _PARSER_POOL
+
+
+def _discard_parser_pool(pool=None):
+    """
+    关闭并丢弃解析池（默认为当前池），下次解析时重建。
+    只有它仍是当前池时才清空 _PARSER_POOL，免得把别的线程刚建好的新池也丢掉。
+    """
+    global _PARSER_POOL
+    with _PARSER_POOL_LOCK:
+        if pool is None:
+            pool = _PARSER_POOL
+        if pool is None:
+            return
+        if _PARSER_POOL is pool:
+            _PARSER_POOL = None
+    pool.shutdown()
+
+
+def _wait_proc(p, timeout, cancel=None):
+    """
+    等价于 p.wait(timeout)，但以固定 5ms 间隔轮询。
+    POSIX 上标准库的 wait(timeout) 轮询间隔会从 0.5ms 翻倍到 50ms，子进程结束后平均还要多等几十毫秒。
+    超时则结束子进程再抛 TimeoutExpired，免得 with Popen 退出时又无限期等它。
+    cancel（threading.Event）被置位时同样结束子进程，返回其（非 0）退出码，调用方按失败处理。
+    """
+    deadline = time.monotonic() + timeout
+    pause = cancel.wait if cancel is not None else time.sleep
+    while True:
+        rc = p.poll()
+        if rc is not None:
+            return rc
+        if cancel is not None and cancel.is_set():
+            p.kill()
+            return p.wait()
+        rem = deadline - time.monotonic()
+        if rem <= 0:
+            p.kill()
+            raise subprocess.TimeoutExpired(p.args, timeout)
+        pause(min(0.005, rem))
+
+
+def _run_map_parser_sync(map_path: Path, show_progress: bool = True, cancel=None) -> bool:
     """
     同步调用 map_parser.py 解析 .map，重写 triggers/actions/events/locals/report。
-    返回 True 表示成功，False 表示失败或超时。
-    """
-    candidates = [
-        Path(__file__).parent / 'map_parser.py',
-        ROOT / 'map_parser.py',
-        ROOT / 'tools' / 'map_parser.py',
-    ]
-    parser_py = None
-    for c in candidates:
-        if c.exists():
-            parser_py = c
-            break
+    返回 True 表示成功，False 表示失败、超时或被 cancel 中止。
+    """
+    parser_py = _MAP_PARSER_PATH
     if not parser_py:
         if show_progress:
             yellow_msg("Could not locate map_parser.py; skip re-parsing.")
@@ -388,6 +769,32 @@ def _run_map_parser_sync(map_path: Path, show_progress: bool = True) -> bool:
 
     if show_progress:
         print(f"{FG_CYAN}Re-parsing .map with {FG_MAGENTA}{parser_py}{FG_CYAN} ...{RESET}")
+
+    # 优先交给常驻的解析进程池；池不可用（导入失败、池进程被结束、任务被取消）时退回一次性子进程，
+    # 例如别的地图超时结束了它的池进程，整个池随之报废，这里的任务并不是解析失败
+    pool = None
+    try:
+        pool = _parser_pool()
+        ok = pool.run(str(map_path), 30, cancel)
+    except FutureTimeoutError:
+        if show_progress:
+            yellow_msg("Map parsing still running after 30s, aborting. This is most likely bugged.")
+        return False
+    except (ImportError, BrokenProcessPool, CancelledError):
+        if pool is not None:
+            _discard_parser_pool(pool)
+    except Exception as e:
+        if show_progress:
+            red_msg(f"Map parsing failed: {e}")
+        return False
+    else:
+        if ok and show_progress:
+            cyan_msg('Map parsing finished.')
+        return ok
+
+    if cancel is not None and cancel.is_set():
+        return False
+
     cmd = [sys.executable, str(parser_py), str(map_path)]
     try:
         with subprocess.Popen(
@@ -397,7 +804,7 @@ def _run_map_parser_sync(map_path: Path, show_progress: bool = True) -> bool:
             stderr=subprocess.STDOUT
         ) as p:
             try:
-                p.wait(timeout=30)
+                _wait_proc(p, 30, cancel)
             except subprocess.TimeoutExpired:
                 if show_progress:
                     yellow_msg("Map parsing still running after 30s, aborting. This is most likely bugged.")
@@ -416,87 +823,178 @@ def _run_map_parser_sync(map_path: Path, show_progress: bool = True) -> bool:
     return True
 
 
+# (项目根目录 mtime_ns, {normcase(stem): Path}, 排好序的 stem 列表)；
+# 根目录增删文件时 mtime 会变，索引随之重建
+_MAPFILE_INDEX = None
+
+
+def _mapfile_index():
+    """
+    一次 scandir 建立项目根目录下 .map 文件的 {stem: Path} 索引，供反复查找复用。
+    返回 (索引, 排好序的 stem 列表)；后者给前缀查找做二分。
+    """
+    global _MAPFILE_INDEX
+    try:
+        mtime = ROOT.stat().st_mtime_ns
+    except OSError:
+        return {}, []
+    if _MAPFILE_INDEX is None or _MAPFILE_INDEX[0] != mtime:
+        idx = {}
+        with os.scandir(ROOT) as it:
+            for e in it:
+                # normcase：Windows 下与原来的 glob/exists 一样不区分大小写
+                n = os.path.normcase(e.name)
+                if n.endswith('.map') and e.is_file():
+                    idx[n[:-4]] = Path(e.path)
+        _MAPFILE_INDEX = (mtime, idx, sorted(idx))
+    return _MAPFILE_INDEX[1], _MAPFILE_INDEX[2]
+
+
+def _mapfile_stat(mapname: str, memo=None, index=None):
+    """
+    返回 (.map 的 Path 或 None, 其 st_mtime_ns 或 None)，只 stat 一次。
+    memo：调用方持有的 dict，同一次列表里同名地图（一个目录多张图）不再重复查找。
+    """
+    if memo is not None:
+        hit = memo.get(mapname)
+        if hit is not None:
+            return hit
+    mapfile = find_mapfile_for(mapname, index)
+    try:
+        mtime = mapfile.stat().st_mtime_ns if mapfile else None
+    except OSError:
+        mtime = None
+    res = (mapfile, mtime)
+    if memo is not None:
+        memo[mapname] = res
+    return res
+
+
 def find_map_files():
     # scan project root for .map files
-    out = []
-    for p in sorted(ROOT.glob('*.map')):
-        out.append(p)
-    return out
+    return sorted(_mapfile_index()[0].values())
 
 
-def find_mapfile_for(mapname: str):
+def find_mapfile_for(mapname: str, index=None):
     """Look for a .map file in project root that matches the given map name.
-    Returns Path or None."""
+    Returns Path or None.
+    index：调用方已取得的 _mapfile_index() 结果，批量查找时省掉每次对 ROOT 的 stat。"""
+    idx, stems = index or _mapfile_index()
+    key = os.path.normcase(mapname)
     # exact match first
-    cand = ROOT / f"{mapname}.map"
-    if cand.exists():
-        return cand
-    # fallback: any file that starts with mapname
-    for p in ROOT.glob(f'{mapname}*.map'):
+    p = idx.get(key)
+    if p is not None:
         return p
+    # fallback: any file that starts with mapname
+    # 以 key 为前缀的 stem 在有序列表里连成一段且都 >= key，二分到的第一个就是原来按序遍历的首个命中
+    i = bisect_left(stems, key)
+    if i < len(stems) and stems[i].startswith(key):
+        return idx[stems[i]]
     return None
 
 
-def _spinner(msg, stop_event):
-    chars = ['|','/','-','\\']
-    i = 0
-    while not stop_event.is_set():
-        sys.stdout.write(f"\r{msg} {chars[i%4]}")
-        sys.stdout.flush()
-        time.sleep(0.12)
-        i += 1
-    sys.stdout.write('\r' + ' ' * (len(msg) + 3) + '\r')
-    sys.stdout.flush()
-
+class _SpinnerService:
+    """
+    会话内常驻的单个 spinner 线程：begin(msg) 开始转，end() 停下并清行。
+    每次生成不再新建/join 一个线程，连续生成多张图时终端也不会在两次之间闪一下。
+    """
 
-def generate_from_map(map_path, auto_open=False, show_progress: bool = True):
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._msg = None    # 当前显示的消息；None 表示空闲
+        self._gen = 0       # 每次 begin 加一，用来区分前后两段（消息可能相同）
+        self._shown = False
+        self._thread = None
+
+    def begin(self, msg):
+        # 输出不是终端（重定向/管道）时不画动画
+        if not sys.stdout.isatty():
+            return
+        with self._cv:
+            self._msg = msg
+            self._gen += 1
+            self._shown = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cv.notify_all()
+
+    def end(self):
+        """停下并等到行已清除后返回，保证随后的输出不会和最后一帧抢行。"""
+        with self._cv:
+            self._msg = None
+            self._cv.notify_all()
+            while self._shown:
+                self._cv.wait()
+
+    def _run(self):
+        write, flush = sys.stdout.write, sys.stdout.flush
+        with self._cv:
+            while True:
+                while self._msg is None:
+                    self._cv.wait()
+                gen = self._gen
+                # 四帧整行先拼好，每帧只有一次 write + flush。
+                # 0.12s 一帧（约 8 FPS）已低于 24 FPS 的上限，再快只会多写终端
+                frames = [f"\r{self._msg} {c}" for c in '|/-\\']
+                i = 0
+                while self._gen == gen and self._msg is not None:
+                    write(frames[i & 3])
+                    flush()
+                    # Condition.wait 会被 end()/begin() 立刻唤醒，不必等满一帧
+                    self._cv.wait(0.12)
+                    i += 1
+                # 回到行首并清除整行（ANSI EL）
+                write('\r\x1b[2K')
+                flush()
+                if self._msg is None:
+                    self._shown = False
+                    self._cv.notify_all()
+
+
+_SPINNER = _SpinnerService()
+
+
+def generate_from_map(map_path, auto_open=False, show_progress: bool = True, cancel=None):
     """从 .map 重新解析 + 清理缓存 + 生成新的 trigger graph。
     返回 True 表示成功，False 表示失败。
+    cancel：可选的 threading.Event，置位后不再开始新步骤，正在跑的 visualize_triggers 子进程会被结束。
     """
     map_path = Path(map_path)
     mapname = map_path.stem
     map_dir = MAPS_DIR / mapname
 
     # 1) 先解析 .map -> 源 JSON
-    if not _run_map_parser_sync(map_path, show_progress=show_progress):
+    if not _run_map_parser_sync(map_path, show_progress=show_progress, cancel=cancel):
         if show_progress:
             yellow_msg('Skip graph generation due to map parsing failure/timeout.')
         return False
 
+    if cancel is not None and cancel.is_set():
+        return False
+
     # 2) 删除旧的布局缓存
-    cache_files = _find_cache_files(map_dir, mapname)
+    # 直接用 scandir 得到的 DirEntry：名字和路径都是现成的 str，不必再构造 Path
+    cache_files = _cache_entries(map_dir, mapname)
     if cache_files and show_progress:
-        files_str = ", ".join(f"{FG_MAGENTA}{p.name}{RESET}" for p in cache_files)
+        files_str = ", ".join(f"{FG_MAGENTA}{e.name}{RESET}" for e in cache_files)
         print(f"{FG_CYAN}Clearing layout cache files: {files_str}{RESET}")
     for cf in cache_files:
         try:
-            cf.unlink()
+            os.unlink(cf.path)
         except FileNotFoundError:
             pass
         except Exception as e:
             if show_progress:
-                red_msg(f"  Failed to remove {cf}: {e}")
+                red_msg(f"  Failed to remove {cf.path}: {e}")
 
     # 3) 调用 visualize_triggers 生成新图
     if show_progress:
         print(f"{FG_CYAN}Generating graph for {FG_MAGENTA}{map_path}{FG_CYAN}...{RESET}")
 
-    vt = ROOT / 'tools' / 'visualize_triggers.py'
-    if vt.exists():
-        script_path = vt
-    else:
-        script_path = ROOT / 'visualize_triggers.py'
-
-    cmd = [sys.executable, str(script_path), '--map', str(map_path), '--quiet']
-    stop_event = threading.Event()
-    spinner_thread = None
+    cmd = [sys.executable, str(_VISUALIZE_PATH), '--map', str(map_path), '--quiet']
     if show_progress:
-        spinner_thread = threading.Thread(
-            target=_spinner,
-            args=(f"{FG_CYAN}Generating {FG_MAGENTA}{map_path.name}{FG_CYAN}...{RESET}", stop_event),
-            daemon=True
-        )
-        spinner_thread.start()
+        _SPINNER.begin(f"{FG_CYAN}Generating {FG_MAGENTA}{map_path.name}{FG_CYAN}...{RESET}")
 
     repo_root = ROOT
     report_path = repo_root / 'data' / 'maps' / f"{mapname}" / f"{mapname}_report.json"
@@ -509,28 +1007,29 @@ def generate_from_map(map_path, auto_open=False, show_progress: bool = True):
             stderr=subprocess.STDOUT
         ) as p:
             try:
-                p.wait(timeout=30)
+                _wait_proc(p, 30, cancel)
             except subprocess.TimeoutExpired:
-                stop_event.set()
-                if spinner_thread:
-                    spinner_thread.join()
+                _SPINNER.end()
                 if show_progress:
                     yellow_msg("Generation still running after 30s, aborting. This is most likely to have bugged.")
                     print(f"{FG_YELLOW}Please check the generation report (if any): {FG_MAGENTA}{report_path}{RESET}")
                 return False
 
+            if cancel is not None and cancel.is_set():
+                return False
             if p.returncode != 0:
                 raise subprocess.CalledProcessError(p.returncode, cmd)
 
     except subprocess.CalledProcessError as e:
-        stop_event.set()
-        if spinner_thread:
-            spinner_thread.join()
+        _SPINNER.end()
         red_msg(f'Generation failed (exit {getattr(e, "returncode", "?")}).')
+        if not show_progress:
+            # 批量/并行生成时不能阻塞在交互提示上，由调用方汇总失败项
+            return False
         print('You can:')
         print(f"  Enter {FG_CYAN}'a'{RESET} to open generation report")
         print(f"  Enter {FG_CYAN}'b'{RESET} to return to main menu")
-        choice = input('Your choice: ').strip().lower()
+        choice = ask('Your choice: ').strip().lower()
         if choice == 'a':
             try:
                 webbrowser.open(report_path.as_uri())
@@ -538,14 +1037,15 @@ def generate_from_map(map_path, auto_open=False, show_progress: bool = True):
                 print(f'{FG_RED}Cannot open {FG_MAGENTA}{report_path}{FG_RED}; please inspect it manually.{RESET}')
         return False
     except Exception as e:
-        stop_event.set()
-        if spinner_thread:
-            spinner_thread.join()
+        _SPINNER.end()
         red_msg(f'Generation failed: {e}')
+        if not show_progress:
+            # 批量/并行生成时不能阻塞在交互提示上，由调用方汇总失败项
+            return False
         print('You can:')
         print(f"  Enter {FG_CYAN}'a'{RESET} to open generation report")
         print(f"  Enter {FG_CYAN}'b'{RESET} to return to main menu")
-        choice = input('Your choice: ').strip().lower()
+        choice = ask('Your choice: ').strip().lower()
         if choice == 'a':
             try:
                 webbrowser.open(report_path.as_uri())
@@ -553,24 +1053,58 @@ def generate_from_map(map_path, auto_open=False, show_progress: bool = True):
                 print(f'{FG_RED}Cannot open {FG_MAGENTA}{report_path}{FG_RED}; please inspect it manually.{RESET}')
         return False
 
-    stop_event.set()
-    if spinner_thread:
-        spinner_thread.join()
+    _SPINNER.end()
     if show_progress:
         print(f"{FG_CYAN}Generation finished for {FG_MAGENTA}{map_path.name}{FG_CYAN}.{RESET}")
     return True
 
 
+def generate_all(map_paths):
+    """并行生成多个 .map。
+    每个 map 的解析与绘图都在各自的子进程里完成，已经绕开了 GIL；
+    这里只用线程池同时驱动最多 cpu_count 个（上限 8）子进程并等待它们结束；
+    每个 visualize_triggers 子进程都要载入整张图，核数很多时同时开太多只会挤内存。
+    """
+    total = len(map_paths)
+    workers = max(1, min(total, 8, os.cpu_count() or 1))
+    failed = 0
+    # Ctrl-C 时置位：排队的任务取消，正在跑的子进程被结束，不必等它们各自跑完（最长 30s）
+    cancel = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = {ex.submit(generate_from_map, m, show_progress=False, cancel=cancel): m for m in map_paths}
+        try:
+            # 结果只在主线程里打印，输出不会互相穿插；前缀是总体进度
+            for done, fut in enumerate(as_completed(futs), start=1):
+                m = futs[fut]
+                prog = f"[{done}/{total}]"
+                try:
+                    ok = fut.result()
+                except Exception as e:
+                    failed += 1
+                    red_msg(f"{prog} Failed to generate for {m}: {e}")
+                    continue
+                if ok:
+                    print(f"{FG_CYAN}{prog} Generation finished for {FG_MAGENTA}{m.name}{FG_CYAN}.{RESET}")
+                else:
+                    failed += 1
+                    red_msg(f"{prog} Failed to generate for {m}")
+        except KeyboardInterrupt:
+            cancel.set()
+            ex.shutdown(wait=True, cancel_futures=True)
+            raise
+    if failed:
+        yellow_msg(f"{failed} of {total} map(s) failed to generate.")
+
+
 def main():
-    server = None
+    # 进入菜单前就把服务器起好（进程内线程，几毫秒），任何打开路径都不再承担冷启动
+    server = start_http_server(ROOT)
     try:
         while True:
             maps = list_maps()
-            print('\nOptions:')
-            print(f'  Enter {FG_CYAN}index number{RESET} to open that graph')
-            print(f"  Enter {FG_CYAN}'g'{RESET} to list .map files and (re)generate graphs")
-            print(f"  Enter {FG_CYAN}'q'{RESET} to quit")
-            choice = input('\nYour choice: ').strip()
+            sys.stdout.write(_OPTIONS_MENU)
+            sys.stdout.flush()
+            choice = ask('\nYour choice: ').strip()
             if choice.lower() == 'q':
                 break
             if choice.lower() == 'g':
@@ -578,42 +1112,30 @@ def main():
                 if not mfiles:
                     yellow_msg('No .map files found in project root.')
                     continue
-                print('\nFound .map files:')
-                for i, m in enumerate(mfiles):
-                    print(f'  [{FG_CYAN}{i}{RESET}] {FG_MAGENTA}{m.name}{RESET}')
-                print(f"  Enter {FG_CYAN}index{RESET} to generate, {FG_CYAN}'a'{RESET} to generate ALL, or {FG_CYAN}leave blank{RESET} to cancel")
-                idx = input('Your choice: ').strip()
+                # 与 list_maps 一样整段拼好一次写出
+                lines = ['\nFound .map files:']
+                lines += [f'  [{FG_CYAN}{i}{RESET}] {FG_MAGENTA}{m.name}{RESET}' for i, m in enumerate(mfiles)]
+                lines.append(f"  Enter {FG_CYAN}index{RESET} to generate, {FG_CYAN}'a'{RESET} to generate ALL, or {FG_CYAN}leave blank{RESET} to cancel")
+                sys.stdout.write('\n'.join(lines) + '\n')
+                sys.stdout.flush()
+                idx = ask('Your choice: ').strip()
                 if idx == '':
                     continue
                 if idx.lower() == 'a':
                     cyan_msg("Generating all .map files...")
-                    for m in mfiles:
-                        try:
-                            generate_from_map(m)
-                        except Exception as ex:
-                            red_msg(f"Failed to generate for {m}: {ex}")
+                    generate_all(mfiles)
                     cyan_msg("All generation attempts finished. Rescanning...")
-                    time.sleep(0.3)
                     continue
                 try:
                     mi = int(idx)
                     if 0 <= mi < len(mfiles):
                         ok = generate_from_map(mfiles[mi])
                         cyan_msg("Generation done. Rescanning...")
-                        time.sleep(0.3)
                         if ok:
                             # rescan and attempt to open the newly generated graph (single-file generation only)
-                            maps = find_graphs()
-                            target_name = mfiles[mi].stem
-                            found = None
-                            for e in maps:
-                                if e['map'] == target_name:
-                                    found = e
-                                    break
+                            # 只扫刚生成的那个地图目录；完整列表下一轮 list_maps 会刷新
+                            found = next(iter(_map_entries(mfiles[mi].stem)), None)
                             if found and found.get('has_html') and found.get('has_node') and found.get('has_debug'):
-                                if server is None:
-                                    server = start_http_server(ROOT)
-                                    time.sleep(0.3)
                                 open_graph_entry(found, skip_physics=False)
                                 # after opening, continue outer loop (list will refresh on next iteration)
                                 continue
@@ -654,16 +1176,11 @@ def main():
                         red_msg("Will not open incomplete trigger_graph.")
                         continue
                     # rescan entries to pick up new/generated files
+                    # 生成在返回前已写完文件，直接重扫即可，不用再等
                     cyan_msg("Generation finished — rescanning...")
-                    time.sleep(0.25)
-                    maps = find_graphs()
-                    # find matching entry again
-                    found = None
-                    for e in maps:
-                        if e['map'] == entry['map']:
-                            found = e
-                            break
-                    if not found:
+                    # find matching entry again（只扫这一个地图目录）
+                    found = next(iter(_map_entries(entry['map'])), None)
+                    if not found or not found['dir_entries']:
                         yellow_msg("Generation seemed to run but no output found. Not opening.")
                         continue
                     entry = found
@@ -696,15 +1213,14 @@ def main():
             mapname = entry['map']
             map_dir = entry.get('html').parent if entry.get('html') else (MAPS_DIR / mapname)
 
-            # ensure HTTP server
-            if server is None:
-                server = start_http_server(ROOT)
-                # give server a moment
-                time.sleep(0.3)
+            # 打开时现扫一次目录（列表可能是几分钟前的），源 JSON 与布局缓存的检查共用这一份快照
+            present = _scan_dir(map_dir)
+            src_files = _source_json_entries(map_dir, mapname, present)
+            mapfile_stat = _mapfile_stat(mapname)
 
             # 如果源 JSON 早于 .map，给出提醒
             try:
-                if _source_outdated(map_dir, mapname):
+                if _source_outdated(map_dir, mapname, src_files, mapfile_stat):
                     print(f"{FG_YELLOW}Note: source JSONs for "
                           f"{FG_MAGENTA}'{mapname}' "
                           f"{FG_YELLOW}seem older than the .map file.{RESET}")
@@ -716,12 +1232,8 @@ def main():
             # Before opening: check whether the original source JSONs (triggers/actions/events/locals)
             # are present in the map directory. If missing, we will still open the HTML but spawn a
             # background map_parser to auto-fill them and inform the user.
-            def _has_source_jsons(d: Path, name: str) -> bool:
-                # require ALL four source JSONs to be present; otherwise consider incomplete
-                return all((d / f"{name}_{k}.json").exists() or (d / f"{k}.json").exists()
-                           for k in ("triggers", "actions", "events", "locals"))
-
-            if not _has_source_jsons(map_dir, mapname):
+            # require ALL four source JSONs to be present; otherwise consider incomplete.
+            if len(src_files) < 4:
                 print(f"{FG_YELLOW}Note: source JSONs (triggers/actions/events/locals) are missing. Repair started in background for: "
                       f"{FG_MAGENTA}{mapname}{FG_YELLOW} (generation info will be written to {FG_MAGENTA}{mapname}_report.json{FG_YELLOW}){RESET}")
                 done_event, result = _spawn_background_map_parser(mapname, map_dir)
@@ -731,11 +1243,8 @@ def main():
 
             # Version check before opening
             try:
-                import json
-                with open(entry['debug_json'], 'r', encoding='utf-8') as f:
-                    dbg = json.load(f)
-                file_ver = dbg.get('tool_version')
-                if isinstance(file_ver, str) and compare_version(file_ver, TOOL_VERSION) < 0:
+                file_ver = _peek_tool_version(entry['debug_json'])
+                if isinstance(file_ver, str) and _parse_version(file_ver) < _TOOL_VERSION_TUPLE:
                     print(f"{FG_YELLOW}Note: this trigger graph was generated using an older version {FG_CYAN}({file_ver}).{RESET}")
                     print(f"{FG_YELLOW}It is recommended to re-generate using the latest visualization tool.{RESET}\n")
             except Exception:
@@ -743,7 +1252,7 @@ def main():
 
             # finally open the graph
             try:
-                cache_status = _cache_status(map_dir, mapname)
+                cache_status = _cache_status(map_dir, mapname, present, mapfile_stat)
             except Exception:
                 cache_status = 'NOT_CACHED'
             
@@ -759,11 +1268,17 @@ def main():
             open_graph_entry(entry, skip_physics=skip_physics)
 
             # If we spawned a background repair, wait for it to finish now and report a concise summary.
+            # 回到菜单前就等修复结束：下一次 ask() 时不会有未汇报的修复，也就不需要
+            # 用 selectors/msvcrt 轮询 stdin 来插播完成提示（那样会打断用户正在输入的行，
+            # Windows 上还得自己实现行编辑）。
             if done_event is not None:
                 # wait with a small dot-progress to avoid blocking print interleaving
                 print(f' {FG_CYAN}Waiting for background repair to complete...{RESET}', end='', flush=True)
-                while not done_event.wait(timeout=0.5):
-                    print(f'{FG_CYAN}.{RESET}', end='', flush=True)
+                # 每秒一个点就够表示"还在跑"；点的字符串拼好复用
+                dot = FG_CYAN + '.' + RESET
+                while not done_event.wait(timeout=1.0):
+                    sys.stdout.write(dot)
+                    sys.stdout.flush()
                 print(f'\n{FG_GREEN}Repair complete.{RESET}', end=' ')
                 try:
                     # 简洁单行提示，用户可自行查看目录或 report
@@ -773,7 +1288,10 @@ def main():
     finally:
         if server:
             cyan_msg('Stopping HTTP server...')
-            server.terminate()
+            server.shutdown()
+            server.server_close()
+        # 正在跑的解析已由各自的等待方在中止时结束；这里关掉空闲的池进程
+        _discard_parser_pool()
 
 
 if __name__ == '__main__':
@@ -8,10 +8,11 @@ import datetime
 import sys
 import urllib.parse   # 用于解析 ?skip_physics=1 之类的查询参数
 import re
+import threading
 
 ROOT = Path(__file__).resolve().parents[1]
 MAPS_DIR = ROOT / 'data' / 'maps'
-PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+PORT = 8000
 
 
 class TriggerHandler(http.server.SimpleHTTPRequestHandler):
@@ -21,6 +22,8 @@ class TriggerHandler(http.server.SimpleHTTPRequestHandler):
         base = ROOT
         # copy from parent but simplified:
         path = path.split('?', 1)[0].split('#', 1)[0]
+        # 请求行里的路径是百分号编码的（浏览器对非 ASCII 地图名也会编码），与父类一样先解码
+        path = urllib.parse.unquote(path, errors='surrogatepass')
         path = os.path.normpath(path.lstrip('/'))
         return str(base / path)
 
@@ -232,10 +235,19 @@ class TriggerHandler(http.server.SimpleHTTPRequestHandler):
         out_dir.mkdir(parents=True, exist_ok=True)
         out_path = out_dir / f"{map_name}_layout.json"
 
+        # 先写临时文件再 os.replace：既不会留下写了一半的布局，
+        # 也会更新目录 mtime（open_trigger_graphs 按目录 mtime 缓存缓存状态）
+        # open_trigger_graphs 在进程内用多线程服务器托管本 handler，临时文件名带上线程 id
+        tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
         try:
-            with out_path.open('w', encoding='utf-8') as f:
+            with tmp_path.open('w', encoding='utf-8') as f:
                 json.dump(layout, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, out_path)
         except Exception as e:
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
             self.send_error(500, f'Write failed: {e}')
             return
 
@@ -252,10 +264,17 @@ class TriggerHandler(http.server.SimpleHTTPRequestHandler):
         self.wfile.write(data)
 
 
+class _ReusableTCPServer(socketserver.TCPServer):
+    # 与 http.server.HTTPServer 一样设置 SO_REUSEADDR：上一次退出后端口还在 TIME_WAIT 时也能立刻重新绑定
+    allow_reuse_address = True
+
+
 def main():
+    # 端口在这里解析而不是导入时：open_trigger_graphs 会直接导入 TriggerHandler
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
     os.chdir(ROOT)
-    with socketserver.TCPServer(("", PORT), TriggerHandler) as httpd:
-        print(f"Serving trigger graphs at http://localhost:{PORT}/ (root={ROOT})")
+    with _ReusableTCPServer(("", port), TriggerHandler) as httpd:
+        print(f"Serving trigger graphs at http://localhost:{port}/ (root={ROOT})")
         httpd.serve_forever()
 
 